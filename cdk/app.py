@@ -44,6 +44,10 @@ app = cdk.App()
 # Pass via: cdk deploy -c ssh_cidr="1.2.3.4/32" -c cloudfront_pl_id="pl-xxxxxxxx"
 ssh_cidr = app.node.try_get_context("ssh_cidr")
 cloudfront_pl_id = app.node.try_get_context("cloudfront_pl_id")
+# Pre-baked workspace AMI name pattern, e.g. -c workspace_ami_name="houseplanner-arm64-*"
+workspace_ami_name = app.node.try_get_context("workspace_ami_name")
+# Route53 zone ID for HOSTED_ZONE_NAME (set in cdk.json); avoids a synth-time lookup
+hosted_zone_id = app.node.try_get_context("hosted_zone_id")
 
 # Default environment for all stacks
 default_env = cdk.Environment(
@@ -87,6 +91,7 @@ compute_stack = HousePlannerComputeStack(
     user_pool_client_id=cognito_stack.user_pool_client_id,
     user_pool_domain_name=cognito_stack.user_pool_domain_name,
     app_domain_name=APP_DOMAIN_NAME,
+    workspace_ami_name=workspace_ami_name,
     description="EC2 launch template and instance role for House Planner",
 )
 compute_stack.add_dependency(network_stack)
@@ -125,6 +130,7 @@ load_balancer_stack = HousePlannerLoadBalancerStack(
     client_secret_arn=cognito_stack.client_secret_arn,
     launch_template_id=compute_stack.launch_template_id,
     hosted_zone_name=HOSTED_ZONE_NAME,
+    hosted_zone_id=hosted_zone_id,
     app_domain_name=APP_DOMAIN_NAME,
     storage_bucket_prefix_param=storage_stack.prefix_param.parameter_arn,
     description="ALB with Cognito OIDC and ensure-instance Lambda for House Planner",
@@ -142,6 +148,7 @@ cloudfront_stack = HousePlannerCloudFrontStack(
     "HousePlannerCloudFrontStack",
     alb_dns_name=load_balancer_stack.alb_dns_name,
     hosted_zone_name=HOSTED_ZONE_NAME,
+    hosted_zone_id=hosted_zone_id,
     app_domain_name=APP_DOMAIN_NAME,
     description="CloudFront CDN distribution for House Planner",
 )
@@ -0,0 +1,165 @@
+#!/usr/bin/env bash
+set -euxo pipefail
+
+# ============================================
+# HousingPlanner instance bootstrap
+#
+# Unpacked with the rest of cdk/boot/ and run by the launch template user
+# data, which exports:
+#   STORAGE_BUCKET_PREFIX, STORAGE_BUCKET_PREFIX_PARAM,
+#   COGNITO_DOMAIN, COGNITO_CLIENT_ID, APP_DOMAIN, APP_BRANCH,
+#   WHEELS_URL (optional; zip of the cdk/wheels cache)
+# and writes the splash page to starting.html alongside this script.
+# ============================================
+
+BOOT_DIR="$(cd "$(dirname "$0")" && pwd)"
+
+echo '===== [BOOT] Cloud-init starting ====='
+
+# ------------------------------------------------------------
+# Ensure ec2-user exists and owns its home
+# ------------------------------------------------------------
+id ec2-user || useradd -m ec2-user
+mkdir -p /home/ec2-user
+chown -R ec2-user:ec2-user /home/ec2-user
+chmod 755 /home/ec2-user
+
+# ------------------------------------------------------------
+# SSH and EC2 Instance Connect setup
+# ------------------------------------------------------------
+echo '[CHECK] Installing EC2 Instance Connect'
+rpm -q ec2-instance-connect || dnf install -y ec2-instance-connect
+
+echo '[CHECK] Ensuring sshd is running'
+systemctl enable sshd
+systemctl restart sshd
+systemctl is-active sshd || (echo '[FATAL] sshd not running' && exit 1)
+
+# ------------------------------------------------------------
+# Idle shutdown (root-owned system service)
+# ------------------------------------------------------------
+echo '[CHECK] Installing idle shutdown script'
+install -m 0755 "${BOOT_DIR}/idle_shutdown.sh" /usr/local/bin/idle_shutdown.sh
+
+echo '[CHECK] Installing idle shutdown systemd service'
+install -m 0644 "${BOOT_DIR}/idle-shutdown.service" /etc/systemd/system/idle-shutdown.service
+
+echo '[CHECK] Installing idle shutdown systemd timer'
+install -m 0644 "${BOOT_DIR}/idle-shutdown.timer" /etc/systemd/system/idle-shutdown.timer
+
+systemctl daemon-reexec
+systemctl daemon-reload
+# Enable and start the TIMER (not the service) - the timer triggers the service
+systemctl enable idle-shutdown.timer
+systemctl start idle-shutdown.timer
+systemctl list-timers | grep idle-shutdown || (echo '[FATAL] idle-shutdown timer not running' && exit 1)
+
+# ------------------------------------------------------------
+# Nginx reverse proxy (port 80 → Streamlit :8501)
+# ------------------------------------------------------------
+echo '[CHECK] Installing nginx'
+rpm -q nginx || dnf install -y nginx
+
+echo '[CHECK] Installing minimal nginx.conf'
+install -m 0644 "${BOOT_DIR}/nginx.conf" /etc/nginx/nginx.conf
+
+# Remove any default config files
+rm -f /etc/nginx/conf.d/default.conf
+
+# Write startup pages BEFORE starting nginx to avoid 'Welcome to nginx!' flash
+echo '[CHECK] Installing nginx startup splash page'
+install -m 0644 "${BOOT_DIR}/starting.html" /usr/share/nginx/html/starting.html
+
+# Copy starting.html to index.html to replace default 'Welcome to nginx!' page
+cp /usr/share/nginx/html/starting.html /usr/share/nginx/html/index.html
+
+echo '[CHECK] Installing nginx Streamlit reverse proxy config'
+install -m 0644 "${BOOT_DIR}/streamlit.nginx.conf" /etc/nginx/conf.d/streamlit.conf
+
+# Replace logout redirect placeholder with actual Cognito URL
+# logout_uri goes to app root (not /logout) to avoid infinite loop
+sed -i "s|COGNITO_LOGOUT_REDIRECT_PLACEHOLDER|https://${COGNITO_DOMAIN}/logout?client_id=${COGNITO_CLIENT_ID}\&logout_uri=https://${APP_DOMAIN}|" /etc/nginx/conf.d/streamlit.conf
+
+# Validate and start nginx with our config (not the default welcome page)
+nginx -t || (echo '[FATAL] nginx config invalid' && exit 1)
+systemctl enable nginx
+systemctl start nginx
+systemctl is-active nginx || (echo '[FATAL] nginx not running' && exit 1)
+
+# ============================================================
+# HousingPlanner bootstrap — ALL as ec2-user
+# ============================================================
+
+# Already present on the pre-baked AMI (packer/houseplanner-arm64.pkr.hcl)
+echo '[CHECK] Installing system packages'
+rpm -q git python3.12 python3.12-devel || dnf install -y git python3.12 python3.12-devel
+
+# --- Prepare ec2-user directories ---
+mkdir -p /home/ec2-user/logs
+chown -R ec2-user:ec2-user /home/ec2-user/logs
+chmod 755 /home/ec2-user/logs
+
+# --- Local wheel cache (see scripts/build_wheels.sh) ---
+if [[ -n "${WHEELS_URL:-}" ]]; then
+  echo '[CHECK] Installing wheel cache'
+  aws s3 cp --no-progress "${WHEELS_URL}" /tmp/wheels.zip
+  rm -rf /opt/wheels
+  python3 -m zipfile -e /tmp/wheels.zip /opt/wheels
+  rm -f /tmp/wheels.zip
+fi
+
+# ------------------------------------------------------------
+# Run application setup as ec2-user
+# ------------------------------------------------------------
+echo '[STREAMLIT] Starting application setup as ec2-user'
+su - ec2-user -c "
+set -x &&
+cd ~ &&
+echo '[STREAMLIT] Cloning repository...' &&
+{ git clone https://github.com/vampireLibrarianMonk/HousingPlanner.git || true; } &&
+cd HousingPlanner &&
+git fetch origin &&
+git checkout ${APP_BRANCH} &&
+git pull --ff-only origin ${APP_BRANCH} &&
+echo '[STREAMLIT] Using branch: ${APP_BRANCH}' &&
+echo '[STREAMLIT] Repository ready' &&
+echo '[STREAMLIT] Creating Python virtual environment...' &&
+python3.12 -m venv .venv &&
+source .venv/bin/activate &&
+echo '[STREAMLIT] Virtual environment activated' &&
+echo '[STREAMLIT] Installing dependencies (this may take 1-2 minutes)...' &&
+{ { [ -d /opt/wheels ] && python -m pip install --no-index --find-links /opt/wheels --upgrade pip; } || python -m pip install --upgrade pip; } &&
+{ { [ -d /opt/wheels ] && python -m pip install --no-index --find-links /opt/wheels -r requirements.txt; } || python -m pip install -r requirements.txt; } &&
+echo '[STREAMLIT] Dependencies installed successfully' &&
+mkdir -p /home/ec2-user/logs"
+
+# ------------------------------------------------------------
+# Streamlit systemd service (starts on every boot)
+# ------------------------------------------------------------
+echo '[STREAMLIT] Installing Streamlit systemd service'
+install -m 0644 "${BOOT_DIR}/streamlit.service" /etc/systemd/system/streamlit.service
+
+# Update the service file with the app domain
+sed -i "s/--browser.serverPort=443/--browser.serverAddress=${APP_DOMAIN} --browser.serverPort=443/" /etc/systemd/system/streamlit.service
+# Inject storage bucket prefix into the service env
+sed -i "s/__STORAGE_BUCKET_PREFIX__/${STORAGE_BUCKET_PREFIX}/" /etc/systemd/system/streamlit.service
+# Inject storage bucket prefix param ARN for SSM fallback
+sed -i "s#__STORAGE_BUCKET_PREFIX_PARAM__#${STORAGE_BUCKET_PREFIX_PARAM}#" /etc/systemd/system/streamlit.service
+# Inject Cognito configuration for proper logout
+sed -i "s/__COGNITO_DOMAIN__/${COGNITO_DOMAIN}/" /etc/systemd/system/streamlit.service
+sed -i "s/__COGNITO_CLIENT_ID__/${COGNITO_CLIENT_ID}/" /etc/systemd/system/streamlit.service
+sed -i "s/__APP_DOMAIN__/${APP_DOMAIN}/" /etc/systemd/system/streamlit.service
+
+systemctl daemon-reload
+systemctl enable streamlit.service
+systemctl start streamlit.service
+
+# Wait briefly and check if Streamlit is listening
+sleep 10
+if ss -tlnp | grep -q ':8501'; then
+  echo '[STREAMLIT] SUCCESS - Streamlit is listening on port 8501'
+else
+  echo '[STREAMLIT] WARNING - Streamlit may still be starting, check: journalctl -u streamlit'
+fi
+
+echo '===== [SUCCESS] Instance fully initialized ====='
@@ -4,6 +4,125 @@ common.py
 Shared constants and utilities for House Planner CDK stacks.
 """
 
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import jsii
+from aws_cdk import BundlingOptions, ILocalBundling, aws_lambda as _lambda, aws_route53 as route53
+from constructs import Construct
+
+# Source directory for all Lambda handlers
+LAMBDA_ASSET_PATH = "lambda"
+
+# -OO strips docstrings and asserts; -b writes each .pyc next to its source
+# (module.pyc) so the .py files can be dropped and the .pyc imported directly.
+# Sourceless .pyc files are never checked against a source, so the timestamps
+# CDK resets inside the Lambda zip don't matter.
+_COMPILEALL_ARGS = ["-OO", "-m", "compileall", "-q", "-b"]
+
+
+@jsii.implements(ILocalBundling)
+class _LocalLambdaBundling:
+    """
+    Bundle the Lambda sources without Docker when a local Python 3.12
+    (matching the Lambda runtime's bytecode format) is available.
+    """
+
+    def try_bundle(self, output_dir: str, *, image, **kwargs) -> bool:
+        if sys.version_info[:2] == (3, 12):
+            python = sys.executable
+        else:
+            python = shutil.which("python3.12")
+        if not python:
+            return False
+
+        shutil.copytree(
+            LAMBDA_ASSET_PATH,
+            output_dir,
+            dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns("__pycache__"),
+        )
+        try:
+            subprocess.run([python, *_COMPILEALL_ARGS, output_dir], check=True)
+        except (OSError, subprocess.CalledProcessError):
+            # Fall back to Docker bundling with the runtime image
+            return False
+
+        for source in Path(output_dir).rglob("*.py"):
+            source.unlink()
+        return True
+
+
+def get_lambda_bundling_options() -> BundlingOptions:
+    """
+    Returns bundling options that ship the Lambda handlers as optimized .pyc only.
+
+    Without precompiled bytecode, every cold start compiles each imported
+    handler module (the Lambda task root is read-only, so nothing is cached).
+    Dropping the sources and docstrings keeps the zip small; tracebacks still
+    name files, functions, and line numbers, just without the source text.
+    """
+    return BundlingOptions(
+        image=_lambda.Runtime.PYTHON_3_12.bundling_image,
+        command=[
+            "bash",
+            "-c",
+            "cp -r /asset-input/. /asset-output/ && "
+            "rm -rf /asset-output/__pycache__ && "
+            "python " + " ".join(_COMPILEALL_ARGS) + " /asset-output && "
+            "find /asset-output -name '*.py' -delete",
+        ],
+        local=_LocalLambdaBundling(),
+    )
+
+
+def get_lambda_code() -> _lambda.Code:
+    """
+    Returns a new Code for the Lambda handlers in lambda/.
+
+    This is a shared factory, not a shared asset: each call creates its own
+    AssetCode (one cannot be reused across stacks, since its asset binds to
+    the first stack using it). Building every function's code here keeps the
+    source, bundling and exclude options identical, so the assets share one
+    fingerprint and resolve to the same S3 object.
+    """
+    return _lambda.Code.from_asset(
+        LAMBDA_ASSET_PATH,
+        bundling=get_lambda_bundling_options(),
+        # Local bytecode caches must not change the asset fingerprint
+        exclude=["__pycache__", "*.pyc"],
+    )
+
+
+def get_hosted_zone(
+    scope: Construct,
+    construct_id: str,
+    *,
+    hosted_zone_name: str,
+    hosted_zone_id: str | None = None,
+) -> route53.IHostedZone:
+    """
+    Returns the app's Route53 hosted zone.
+
+    With a known zone ID (the `hosted_zone_id` context value) the zone is
+    referenced directly; otherwise it falls back to a synth-time lookup, which
+    needs AWS credentials and a cdk.context.json entry.
+    """
+    if hosted_zone_id:
+        return route53.HostedZone.from_hosted_zone_attributes(
+            scope,
+            construct_id,
+            hosted_zone_id=hosted_zone_id,
+            zone_name=hosted_zone_name,
+        )
+    return route53.HostedZone.from_lookup(
+        scope,
+        construct_id,
+        domain_name=hosted_zone_name,
+    )
+
 
 def get_warmup_page_html() -> str:
     """
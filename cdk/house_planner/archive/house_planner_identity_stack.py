@@ -126,13 +126,13 @@ class HousePlannerIdentityStack(Stack):
         # EC2 user-data assets (UNCHANGED)
         # --------------------------------------------------
         idle_script_asset = s3_assets.Asset(
-            self, "IdleShutdownScript", path="scripts/idle_shutdown.sh"
+            self, "IdleShutdownScript", path="boot/idle_shutdown.sh"
         )
         idle_service_asset = s3_assets.Asset(
-            self, "IdleShutdownService", path="service/idle-shutdown.service"
+            self, "IdleShutdownService", path="boot/idle-shutdown.service"
         )
         idle_timer_asset = s3_assets.Asset(
-            self, "IdleShutdownTimer", path="service/idle-shutdown.timer"
+            self, "IdleShutdownTimer", path="boot/idle-shutdown.timer"
         )
 
         user_data = ec2.UserData.for_linux()
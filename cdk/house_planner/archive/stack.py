@@ -71,19 +71,19 @@ class HousePlannerStack(Stack):
         idle_script_asset = s3_assets.Asset(
             self,
             "IdleShutdownScript",
-            path="scripts/idle_shutdown.sh",
+            path="boot/idle_shutdown.sh",
         )
 
         idle_service_asset = s3_assets.Asset(
             self,
             "IdleShutdownService",
-            path="service/idle-shutdown.service",
+            path="boot/idle-shutdown.service",
         )
 
         idle_timer_asset = s3_assets.Asset(
             self,
             "IdleShutdownTimer",
-            path="service/idle-shutdown.timer",
+            path="boot/idle-shutdown.timer",
         )
 
         ssh_cidr = self.node.try_get_context("ssh_cidr")
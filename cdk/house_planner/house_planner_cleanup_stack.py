@@ -23,6 +23,8 @@ from aws_cdk import (
 )
 from constructs import Construct
 
+from common import get_lambda_code
+
 
 class HousePlannerCleanupStack(Stack):
     """
@@ -57,8 +59,10 @@ class HousePlannerCleanupStack(Stack):
             "DeleteUserResourcesLambda",
             function_name="HousePlannerDeleteUserResources",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            # Handlers are pure Python (boto3 only), so Graviton needs no rebuild
+            architecture=_lambda.Architecture.ARM_64,
             handler="delete_instance.lambda_handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=get_lambda_code(),
             timeout=Duration.seconds(120),
             memory_size=256,
             description="Cleans up EC2 instance and ALB resources when user is deleted",
@@ -66,33 +70,28 @@ class HousePlannerCleanupStack(Stack):
                 "ALB_ARN": alb_arn,
                 "USER_POOL_ID": user_pool_id,
                 "STORAGE_BUCKET_PREFIX_PARAM": storage_bucket_prefix_param,
+                # Disable once all listener rules carry the OwnerSub tag
+                "LEGACY_RULE_SCAN": "true",
             },
         )
 
         # --------------------------------------------------
         # Lambda IAM Permissions
         # --------------------------------------------------
+        # Everything that can't be scoped to an ARN shares one statement
         self.delete_lambda.add_to_role_policy(
             iam.PolicyStatement(
-                sid="EC2Cleanup",
+                sid="WorkspaceCleanup",
                 actions=[
                     "ec2:DescribeInstances",
                     "ec2:TerminateInstances",
-                ],
-                resources=["*"],
-            )
-        )
-
-        self.delete_lambda.add_to_role_policy(
-            iam.PolicyStatement(
-                sid="ALBCleanup",
-                actions=[
                     "elasticloadbalancing:DescribeListeners",
                     "elasticloadbalancing:DescribeRules",
                     "elasticloadbalancing:DescribeTargetGroups",
                     "elasticloadbalancing:DeleteRule",
                     "elasticloadbalancing:DeleteTargetGroup",
-                    "elasticloadbalancing:DeregisterTargets",
+                    # Find the user's listener rules by OwnerSub tag
+                    "tag:GetResources",
                 ],
                 resources=["*"],
             )
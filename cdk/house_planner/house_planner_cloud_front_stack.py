@@ -32,6 +32,8 @@ from aws_cdk import (
 from constructs import Construct
 import os
 
+from common import get_hosted_zone
+
 
 class HousePlannerCloudFrontStack(Stack):
     """
@@ -46,12 +48,14 @@ class HousePlannerCloudFrontStack(Stack):
         *,
         alb_dns_name: str,
         hosted_zone_name: str,
+        hosted_zone_id: str | None = None,
         app_domain_name: str,
         **kwargs,
     ) -> None:
         """
         :param alb_dns_name: DNS name of the ALB
         :param hosted_zone_name: Base hosted zone (e.g. housing-planner.com)
+        :param hosted_zone_id: Route53 zone ID; skips the synth-time zone lookup
         :param app_domain_name: Full app domain (e.g. app.housing-planner.com)
         """
         # Force us-east-1 for CloudFront + ACM
@@ -66,12 +70,13 @@ class HousePlannerCloudFrontStack(Stack):
         )
 
         # --------------------------------------------------
-        # Route53 hosted zone lookup
+        # Route53 hosted zone
         # --------------------------------------------------
-        hosted_zone = route53.HostedZone.from_lookup(
+        hosted_zone = get_hosted_zone(
             self,
             "HousePlannerHostedZone",
-            domain_name=hosted_zone_name,
+            hosted_zone_name=hosted_zone_name,
+            hosted_zone_id=hosted_zone_id,
         )
 
         # --------------------------------------------------
@@ -121,6 +126,36 @@ class HousePlannerCloudFrontStack(Stack):
             ),
         )
 
+        # Streamlit's hashed /static/* bundles are identical for every user, so
+        # share them at the edge instead of pulling them through the ALB and the
+        # user's instance on every page load. Cookies are still forwarded (ALB
+        # auth + instance routing) but kept out of the cache key. default_ttl=0
+        # means only responses that opt in via Cache-Control are cached, so ALB
+        # login redirects and the nginx starting page never are.
+        static_cache_policy = cloudfront.CachePolicy(
+            self,
+            "StaticAssetCache",
+            comment="Streamlit static bundles, shared across users",
+            min_ttl=Duration.seconds(0),
+            default_ttl=Duration.seconds(0),
+            max_ttl=Duration.days(1),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True,
+        )
+
+        distribution.add_behavior(
+            "/static/*",
+            alb_origin,
+            viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+            allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+            cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD,
+            cache_policy=static_cache_policy,
+            origin_request_policy=cloudfront.OriginRequestPolicy.ALL_VIEWER,
+        )
+
         # --------------------------------------------------
         # Route53 alias: app.<domain> → CloudFront
         # --------------------------------------------------
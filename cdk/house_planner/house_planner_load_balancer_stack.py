@@ -23,13 +23,12 @@ from aws_cdk import (
     aws_elasticloadbalancingv2 as elbv2,
     aws_elasticloadbalancingv2_targets as elbv2_targets,
     aws_certificatemanager as acm,
-    aws_route53 as route53,
     aws_iam as iam,
     aws_lambda as _lambda,
 )
 from constructs import Construct
 
-from common import get_warmup_page_html
+from common import get_hosted_zone, get_lambda_code, get_warmup_page_html
 
 
 class HousePlannerLoadBalancerStack(Stack):
@@ -52,6 +51,7 @@ class HousePlannerLoadBalancerStack(Stack):
         client_secret_arn: str,
         launch_template_id: str,
         hosted_zone_name: str,
+        hosted_zone_id: str | None = None,
         app_domain_name: str,
         storage_bucket_prefix_param: str,
         **kwargs,
@@ -66,6 +66,7 @@ class HousePlannerLoadBalancerStack(Stack):
         :param client_secret_arn: ARN of the client secret in Secrets Manager
         :param launch_template_id: EC2 launch template ID
         :param hosted_zone_name: Base hosted zone (e.g. housing-planner.com)
+        :param hosted_zone_id: Route53 zone ID; skips the synth-time zone lookup
         :param app_domain_name: Full app domain (e.g. app.housing-planner.com)
         """
         super().__init__(scope, construct_id, **kwargs)
@@ -88,10 +89,11 @@ class HousePlannerLoadBalancerStack(Stack):
         # --------------------------------------------------
         # ACM Certificate for ALB
         # --------------------------------------------------
-        hosted_zone = route53.HostedZone.from_lookup(
+        hosted_zone = get_hosted_zone(
             self,
             "HostedZone",
-            domain_name=hosted_zone_name,
+            hosted_zone_name=hosted_zone_name,
+            hosted_zone_id=hosted_zone_id,
         )
 
         certificate = acm.Certificate(
@@ -115,11 +117,16 @@ class HousePlannerLoadBalancerStack(Stack):
             "EnsureInstanceLambda",
             function_name="HousePlannerEnsureInstance",
             runtime=_lambda.Runtime.PYTHON_3_12,
+            # Handlers are pure Python (boto3 only), so Graviton needs no rebuild
+            architecture=_lambda.Architecture.ARM_64,
             handler="ensure_instance.lambda_handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=get_lambda_code(),
             timeout=Duration.seconds(120),
             memory_size=256,
             description="Provisions or starts EC2 instance for authenticated user",
+            # Restore from a pre-initialized snapshot (boto3 clients already built)
+            # instead of paying full interpreter + boto3 init on cold invocations.
+            snap_start=_lambda.SnapStartConf.ON_PUBLISHED_VERSIONS,
             environment={
                 "LAUNCH_TEMPLATE_ID": launch_template_id,
                 "SUBNET_ID": vpc.public_subnets[0].subnet_id,
@@ -138,23 +145,18 @@ class HousePlannerLoadBalancerStack(Stack):
         )
 
         # Lambda IAM Permissions
+        # Everything that can't be scoped to an ARN shares one statement
         self.ensure_lambda.add_to_role_policy(
             iam.PolicyStatement(
-                sid="EC2Management",
+                sid="WorkspaceProvisioning",
                 actions=[
+                    # EC2 workspace lifecycle
                     "ec2:DescribeInstances",
+                    "ec2:DescribeInstanceStatus",
                     "ec2:RunInstances",
                     "ec2:StartInstances",
                     "ec2:CreateTags",
-                ],
-                resources=["*"],
-            )
-        )
-
-        self.ensure_lambda.add_to_role_policy(
-            iam.PolicyStatement(
-                sid="S3UserBucketProvisioning",
-                actions=[
+                    # Per-user bucket creation (name not known up front)
                     "s3:CreateBucket",
                     "s3:PutBucketTagging",
                     "s3:PutBucketEncryption",
@@ -162,6 +164,22 @@ class HousePlannerLoadBalancerStack(Stack):
                     "s3:PutBucketPublicAccessBlock",
                     "s3:ListBucket",
                     "s3:GetBucketLocation",
+                    # Per-user target groups and listener rules
+                    "elasticloadbalancing:DescribeListeners",
+                    "elasticloadbalancing:DescribeRules",
+                    "elasticloadbalancing:DescribeTargetGroups",
+                    "elasticloadbalancing:DescribeTargetHealth",
+                    "elasticloadbalancing:CreateTargetGroup",
+                    "elasticloadbalancing:DeleteTargetGroup",
+                    "elasticloadbalancing:ModifyTargetGroupAttributes",
+                    "elasticloadbalancing:RegisterTargets",
+                    "elasticloadbalancing:DeregisterTargets",
+                    "elasticloadbalancing:CreateRule",
+                    "elasticloadbalancing:DeleteRule",
+                    "elasticloadbalancing:ModifyRule",
+                    "elasticloadbalancing:AddTags",
+                    # Find the user's listener rule by OwnerSub tag
+                    "tag:GetResources",
                 ],
                 resources=["*"],
             )
@@ -187,28 +205,6 @@ class HousePlannerLoadBalancerStack(Stack):
             )
         )
 
-        self.ensure_lambda.add_to_role_policy(
-            iam.PolicyStatement(
-                sid="ALBTargetGroupManagement",
-                actions=[
-                    "elasticloadbalancing:DescribeListeners",
-                    "elasticloadbalancing:DescribeRules",
-                    "elasticloadbalancing:DescribeTargetGroups",
-                    "elasticloadbalancing:DescribeTargetHealth",
-                    "elasticloadbalancing:CreateTargetGroup",
-                    "elasticloadbalancing:DeleteTargetGroup",
-                    "elasticloadbalancing:ModifyTargetGroupAttributes",
-                    "elasticloadbalancing:RegisterTargets",
-                    "elasticloadbalancing:DeregisterTargets",
-                    "elasticloadbalancing:CreateRule",
-                    "elasticloadbalancing:DeleteRule",
-                    "elasticloadbalancing:ModifyRule",
-                    "elasticloadbalancing:AddTags",
-                ],
-                resources=["*"],
-            )
-        )
-
         # Allow IAM pass role for EC2 instance profile
         self.ensure_lambda.add_to_role_policy(
             iam.PolicyStatement(
@@ -235,7 +231,9 @@ class HousePlannerLoadBalancerStack(Stack):
             "EnsureLambdaTargetGroup",
             target_group_name="HousePlannerEnsureTG",
             target_type=elbv2.TargetType.LAMBDA,
-            targets=[elbv2_targets.LambdaTarget(self.ensure_lambda)],
+            # SnapStart only applies to published versions, so target the version
+            # rather than $LATEST.
+            targets=[elbv2_targets.LambdaTarget(self.ensure_lambda.current_version)],
         )
         ensure_target_group.configure_health_check(enabled=False)
 
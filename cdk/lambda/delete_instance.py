@@ -12,43 +12,97 @@ Responsibilities:
 - Delete the user's target group
 """
 
+import functools
 import hashlib
 import logging
 import boto3
 import os
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-ec2 = boto3.client("ec2")
-elbv2 = boto3.client("elbv2")
-cognito = boto3.client("cognito-idp")
-ssm = boto3.client("ssm")
-s3 = boto3.client("s3")
+# Keep warm containers' HTTPS connections to AWS endpoints alive between invocations
+_BOTO_CONFIG = Config(tcp_keepalive=True)
 
-# Cache the listener ARN to avoid repeated API calls
-_cached_listener_arn = None
+ec2 = boto3.client("ec2", config=_BOTO_CONFIG)
+elbv2 = boto3.client("elbv2", config=_BOTO_CONFIG)
+ssm = boto3.client("ssm", config=_BOTO_CONFIG)
+s3 = boto3.client("s3", config=_BOTO_CONFIG)
+tagging = boto3.client("resourcegroupstaggingapi", config=_BOTO_CONFIG)
+# CloudTrail events normally carry the sub, so Cognito is only needed for the
+# username fallback; its client is built on first use, not at init.
+_cognito = None
 
+_USER_POOL_ID = os.environ.get("USER_POOL_ID")
 
-def _get_https_listener_arn(alb_arn: str) -> str:
+# Workers for independent teardown calls (boto3 clients are thread-safe)
+_TEARDOWN_WORKERS = 8
+
+# Fall back to scanning every listener rule when no OwnerSub-tagged rule is
+# found. Only needed while rules created before tagging still exist.
+_LEGACY_RULE_SCAN = os.environ.get("LEGACY_RULE_SCAN", "true").lower() == "true"
+
+
+def _discover_https_listener_arn(alb_arn: str) -> str:
     """
     Discover the HTTPS (port 443) listener ARN from the ALB.
-    Caches the result for subsequent calls.
     """
-    global _cached_listener_arn
-    if _cached_listener_arn:
-        return _cached_listener_arn
-
     resp = elbv2.describe_listeners(LoadBalancerArn=alb_arn)
     for listener in resp.get("Listeners", []):
         if listener.get("Port") == 443:
-            _cached_listener_arn = listener["ListenerArn"]
-            logger.info("Discovered HTTPS listener: %s", _cached_listener_arn)
-            return _cached_listener_arn
+            logger.info("Discovered HTTPS listener: %s", listener["ListenerArn"])
+            return listener["ListenerArn"]
 
     raise RuntimeError(f"No HTTPS listener found on ALB {alb_arn}")
 
 
+# Resolve the listener ARN once per container during cold start.
+# Import must still succeed outside Lambda (or if the lookup fails),
+# in which case the first invocation resolves it instead.
+try:
+    _cached_listener_arn = _discover_https_listener_arn(os.environ["ALB_ARN"])
+except Exception as e:
+    logger.warning("Listener discovery deferred to first invocation: %s", e)
+    _cached_listener_arn = None
+
+
+def _get_https_listener_arn(alb_arn: str) -> str:
+    """
+    Return the HTTPS listener ARN resolved at cold start.
+    Only hits the API if cold-start discovery did not succeed.
+    """
+    global _cached_listener_arn
+    if _cached_listener_arn is None:
+        _cached_listener_arn = _discover_https_listener_arn(alb_arn)
+    return _cached_listener_arn
+
+
+def _cognito_client():
+    global _cognito
+    if _cognito is None:
+        _cognito = boto3.client("cognito-idp", config=_BOTO_CONFIG)
+    return _cognito
+
+
+@functools.lru_cache(maxsize=256)
+def _username_to_sub(username: str) -> str | None:
+    """
+    Look up a user's sub by username. A username's sub never changes, so
+    results are cached across warm invocations (failed lookups raise and
+    are not cached).
+    """
+    resp = _cognito_client().admin_get_user(
+        UserPoolId=_USER_POOL_ID,
+        Username=username,
+    )
+    return next(
+        (a["Value"] for a in resp.get("UserAttributes", []) if a["Name"] == "sub"),
+        None,
+    )
+
+
 def _resolve_to_sub(event: dict) -> str:
     """
     Extract the user's 'sub' (unique identifier) from the event.
@@ -77,17 +131,12 @@ def _resolve_to_sub(event: dict) -> str:
     
     if username and username != "HIDDEN_DUE_TO_SECURITY_REASONS":
         try:
-            resp = cognito.admin_get_user(
-                UserPoolId=os.environ["USER_POOL_ID"],
-                Username=username,
-            )
-            attrs = {a["Name"]: a["Value"] for a in resp.get("UserAttributes", [])}
-            user_sub = attrs.get("sub")
+            user_sub = _username_to_sub(username)
             if user_sub:
                 logger.info("Resolved username %s to sub %s", username, user_sub)
                 return user_sub
             return username
-        except cognito.exceptions.UserNotFoundException:
+        except _cognito_client().exceptions.UserNotFoundException:
             logger.warning("User %s not found in Cognito", username)
         except Exception as e:
             logger.warning("Error looking up user %s: %s", username, e)
@@ -102,24 +151,100 @@ def _resolve_to_sub(event: dict) -> str:
     return None
 
 
+@functools.lru_cache(maxsize=256)
 def _tg_name(user_sub: str, listener_arn: str) -> str:
     """
     Generate the target group name for a user.
     Must match the naming scheme used in ensure_instance.py.
     """
-    suffix = hashlib.sha1((user_sub + listener_arn).encode()).hexdigest()[:16]
+    suffix = hashlib.sha1((user_sub + listener_arn).encode(), usedforsecurity=False).hexdigest()[:16]
     return f"u-{suffix}"
 
 
+@functools.lru_cache(maxsize=256)
 def _routing_cookie_name(user_sub: str) -> str:
     """
     Generate the routing cookie name for a user.
     Must match the naming scheme used in ensure_instance.py.
     """
-    suffix = hashlib.sha1(user_sub.encode()).hexdigest()[:12]
+    suffix = hashlib.sha1(user_sub.encode(), usedforsecurity=False).hexdigest()[:12]
     return f"hp_route_{suffix}"
 
 
+def _find_user_rule_arns_by_tag(listener_arn: str, user_sub: str) -> list[str]:
+    """
+    Look up the user's listener rules via their OwnerSub tag.
+    Rules are tagged at creation time in ensure_instance.py.
+    """
+    # Rule ARNs share the listener ARN's path under "listener-rule/"
+    rule_prefix = listener_arn.replace(":listener/", ":listener-rule/", 1) + "/"
+    rule_arns = []
+    paginator = tagging.get_paginator("get_resources")
+    for page in paginator.paginate(
+        TagFilters=[
+            {"Key": "OwnerSub", "Values": [user_sub]},
+            {"Key": "Purpose", "Values": ["HousePlannerUser"]},
+        ],
+        ResourceTypeFilters=["elasticloadbalancing:listener-rule"],
+    ):
+        for resource in page.get("ResourceTagMappingList", []):
+            arn = resource["ResourceARN"]
+            if arn.startswith(rule_prefix):
+                rule_arns.append(arn)
+    return rule_arns
+
+
+def _find_user_rule_arns_by_scan(listener_arn: str, user_sub: str) -> list[str]:
+    """
+    Legacy lookup: scan every rule on the listener for the user's routing
+    cookie (or the old x-amzn-oidc-identity header condition).
+    Needed for rules created before rules were tagged with OwnerSub.
+    """
+    cookie_name = _routing_cookie_name(user_sub)
+    rule_arns = []
+    paginator = elbv2.get_paginator("describe_rules")
+    for page in paginator.paginate(ListenerArn=listener_arn):
+        for rule in page.get("Rules", []):
+            # Skip the default rule
+            if rule.get("IsDefault"):
+                continue
+
+            for cond in rule.get("Conditions", []):
+                if cond.get("Field") != "http-header":
+                    continue
+                http_config = cond.get("HttpHeaderConfig", {})
+                header_name = http_config.get("HttpHeaderName", "").lower()
+
+                # Match cookie-based rules (new format)
+                if header_name == "cookie":
+                    matched = any(cookie_name in v for v in http_config.get("Values", []))
+                # Also match old x-amzn-oidc-identity rules (for backwards compatibility)
+                elif header_name == "x-amzn-oidc-identity":
+                    matched = user_sub in http_config.get("Values", [])
+                else:
+                    continue
+
+                if matched:
+                    logger.info("Matched %s rule: %s", header_name, rule["RuleArn"])
+                    rule_arns.append(rule["RuleArn"])
+                    # One match is enough; don't inspect the rule's other conditions
+                    break
+    return rule_arns
+
+
+def _find_user_rule_arns(listener_arn: str, user_sub: str) -> list[str]:
+    """
+    Find the user's listener rules, preferring the tag index.
+    Falls back to the full listener scan (when enabled) for untagged rules.
+    """
+    rule_arns = _find_user_rule_arns_by_tag(listener_arn, user_sub)
+    if rule_arns or not _LEGACY_RULE_SCAN:
+        return rule_arns
+
+    logger.info("No tagged rules for user_sub %s; scanning listener rules", user_sub)
+    return _find_user_rule_arns_by_scan(listener_arn, user_sub)
+
+
 def _bucket_prefix() -> str:
     param_arn = os.environ["STORAGE_BUCKET_PREFIX_PARAM"]
     response = ssm.get_parameter(Name=param_arn)
@@ -146,6 +271,36 @@ def _purge_and_delete_bucket(bucket_name: str) -> None:
     s3.delete_bucket(Bucket=bucket_name)
 
 
+def _terminate_instances(instance_ids: list[str]) -> None:
+    # Fire-and-forget: nothing downstream needs the instances fully terminated
+    # (a target group only has to be unreferenced by listener rules to be
+    # deleted), so don't bill Lambda time polling for "terminated".
+    logger.info("Terminating instances: %s", instance_ids)
+    ec2.terminate_instances(InstanceIds=instance_ids)
+
+
+def _find_target_groups(tg_name: str) -> list[dict]:
+    try:
+        resp = elbv2.describe_target_groups(Names=[tg_name])
+        return resp.get("TargetGroups", [])
+    except elbv2.exceptions.TargetGroupNotFoundException:
+        logger.info("Target group %s not found (already deleted or never created)", tg_name)
+    except Exception as e:
+        logger.error("Error looking up target group: %s", e)
+    return []
+
+
+def _delete_user_bucket(user_sub: str) -> None:
+    bucket_name = _bucket_name_for_user(user_sub)
+    try:
+        _purge_and_delete_bucket(bucket_name)
+        logger.info("Deleted user bucket: %s", bucket_name)
+    except s3.exceptions.NoSuchBucket:
+        logger.info("User bucket not found: %s", bucket_name)
+    except Exception as e:
+        logger.error("Error deleting user bucket %s: %s", bucket_name, e)
+
+
 def lambda_handler(event, context):
     """
     Main handler for user deletion cleanup.
@@ -164,100 +319,73 @@ def lambda_handler(event, context):
     listener_arn = _get_https_listener_arn(alb_arn)
 
     # ---------- Find & terminate EC2 instances ----------
-    instances = ec2.describe_instances(
+    pages = ec2.get_paginator("describe_instances").paginate(
         Filters=[
             {"Name": "tag:OwnerSub", "Values": [user_sub]},
             {"Name": "tag:Purpose", "Values": ["HousePlannerUser"]},
             {"Name": "instance-state-name", "Values": ["pending", "running", "stopped", "stopping"]},
-        ]
+        ],
     )
 
     instance_ids = [
         i["InstanceId"]
-        for r in instances.get("Reservations", [])
+        for page in pages
+        for r in page.get("Reservations", [])
         for i in r.get("Instances", [])
     ]
 
-    if instance_ids:
-        logger.info("Terminating instances: %s", instance_ids)
-        ec2.terminate_instances(InstanceIds=instance_ids)
+    tg_name = _tg_name(user_sub, listener_arn)
+    logger.info("Looking for target group: %s", tg_name)
 
-        # Wait for instances to fully terminate
+    # Instance termination, rule cleanup, target group discovery, and bucket
+    # deletion are independent; only delete_target_group has to wait for the
+    # rules referencing the group to be gone.
+    with ThreadPoolExecutor(max_workers=_TEARDOWN_WORKERS) as pool:
+        if instance_ids:
+            terminate_future = pool.submit(_terminate_instances, instance_ids)
+        else:
+            logger.info("No EC2 instances found for user_sub: %s", user_sub)
+            terminate_future = None
+        rules_future = pool.submit(_find_user_rule_arns, listener_arn, user_sub)
+        tg_future = pool.submit(_find_target_groups, tg_name)
+        bucket_future = pool.submit(_delete_user_bucket, user_sub)
+
+        # ---------- Delete ALB listener rules ----------
+        rules_deleted = 0
         try:
-            waiter = ec2.get_waiter("instance_terminated")
-            waiter.wait(
-                InstanceIds=instance_ids,
-                WaiterConfig={"Delay": 5, "MaxAttempts": 40}  # Up to ~3 minutes
-            )
-            logger.info("Instances terminated successfully")
+            delete_futures = {
+                pool.submit(elbv2.delete_rule, RuleArn=rule_arn): rule_arn
+                for rule_arn in rules_future.result()
+            }
+            for fut in as_completed(delete_futures):
+                try:
+                    fut.result()
+                    logger.info("Deleted listener rule: %s", delete_futures[fut])
+                    rules_deleted += 1
+                except Exception as e:
+                    logger.error("Error deleting rule %s: %s", delete_futures[fut], e)
         except Exception as e:
-            logger.warning("Waiter error (continuing anyway): %s", e)
-    else:
-        logger.info("No EC2 instances found for user_sub: %s", user_sub)
-
-    # ---------- Find & delete ALB listener rules ----------
-    # Rules are identified by the routing cookie pattern
-    cookie_name = _routing_cookie_name(user_sub)
-    rules_deleted = 0
-    try:
-        paginator = elbv2.get_paginator("describe_rules")
-        for page in paginator.paginate(ListenerArn=listener_arn):
-            for rule in page.get("Rules", []):
-                # Skip the default rule
-                if rule.get("IsDefault"):
-                    continue
-                    
-                for cond in rule.get("Conditions", []):
-                    if cond.get("Field") == "http-header":
-                        http_config = cond.get("HttpHeaderConfig", {})
-                        header_name = http_config.get("HttpHeaderName", "").lower()
-                        values = http_config.get("Values", [])
-                        
-                        # Match cookie-based rules (new format)
-                        if header_name == "cookie":
-                            for v in values:
-                                if cookie_name in v:
-                                    logger.info("Deleting cookie-based rule: %s", rule["RuleArn"])
-                                    elbv2.delete_rule(RuleArn=rule["RuleArn"])
-                                    rules_deleted += 1
-                                    break
-                        
-                        # Also match old x-amzn-oidc-identity rules (for backwards compatibility)
-                        elif header_name == "x-amzn-oidc-identity":
-                            if user_sub in values:
-                                logger.info("Deleting legacy rule: %s", rule["RuleArn"])
-                                elbv2.delete_rule(RuleArn=rule["RuleArn"])
-                                rules_deleted += 1
-    except Exception as e:
-        logger.error("Error deleting listener rules: %s", e)
-    
-    logger.info("Deleted %d listener rules", rules_deleted)
-
-    # ---------- Find & delete target group ----------
-    tg_name = _tg_name(user_sub, listener_arn)
-    logger.info("Looking for target group: %s", tg_name)
-    
-    try:
-        resp = elbv2.describe_target_groups(Names=[tg_name])
-        for tg in resp.get("TargetGroups", []):
-            logger.info("Deleting target group: %s", tg["TargetGroupArn"])
-            elbv2.delete_target_group(TargetGroupArn=tg["TargetGroupArn"])
-    except elbv2.exceptions.TargetGroupNotFoundException:
-        logger.info("Target group %s not found (already deleted or never created)", tg_name)
-    except Exception as e:
-        logger.error("Error deleting target group: %s", e)
+            logger.error("Error deleting listener rules: %s", e)
+
+        logger.info("Deleted %d listener rules", rules_deleted)
+
+        # ---------- Delete target group ----------
+        # Registered (terminating) targets don't block deletion
+        for tg in tg_future.result():
+            try:
+                logger.info("Deleting target group: %s", tg["TargetGroupArn"])
+                elbv2.delete_target_group(TargetGroupArn=tg["TargetGroupArn"])
+            except Exception as e:
+                logger.error("Error deleting target group: %s", e)
+
+        if terminate_future:
+            try:
+                terminate_future.result()
+            except Exception as e:
+                logger.error("Error terminating instances: %s", e)
+        bucket_future.result()
 
     logger.info("Cleanup complete for user_sub: %s", user_sub)
-
-    # ---------- Delete per-user S3 bucket ----------
-    bucket_name = _bucket_name_for_user(user_sub)
-    try:
-        _purge_and_delete_bucket(bucket_name)
-        logger.info("Deleted user bucket: %s", bucket_name)
-    except s3.exceptions.NoSuchBucket:
-        logger.info("User bucket not found: %s", bucket_name)
-    except Exception as e:
-        logger.error("Error deleting user bucket %s: %s", bucket_name, e)
     
     # Return the original event for Cognito triggers
     return event
@@ -1,22 +1,42 @@
 import boto3
 import os
+import functools
 import hashlib
 import logging
 import time
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-ec2 = boto3.client("ec2")
-elbv2 = boto3.client("elbv2")
-secretsmanager = boto3.client("secretsmanager")
-ssm = boto3.client("ssm")
-s3 = boto3.client("s3")
+# Keep warm containers' HTTPS connections to AWS endpoints alive between invocations
+_BOTO_CONFIG = Config(tcp_keepalive=True)
+
+ec2 = boto3.client("ec2", config=_BOTO_CONFIG)
+elbv2 = boto3.client("elbv2", config=_BOTO_CONFIG)
+ssm = boto3.client("ssm", config=_BOTO_CONFIG)
+s3 = boto3.client("s3", config=_BOTO_CONFIG)
+tagging = boto3.client("resourcegroupstaggingapi", config=_BOTO_CONFIG)
 
 # Cache values to avoid repeated API calls
 _cached_listener_arn = None
 _cached_client_secret = None
+# Only needed when a user's first listener rule is created, so the Secrets
+# Manager client (and its service model) is built on first use, not at init.
+_secretsmanager = None
+# Per-user target groups by name, and (target group ARN, instance ID) pairs
+# already registered by this container. Both only ever grow for a given user.
+_cached_target_groups: dict[str, dict] = {}
+_registered_targets: set[tuple[str, str]] = set()
+# Listener ARN -> (fetched_at, used rule priorities); see _used_rule_priorities
+_PRIORITY_CACHE_TTL_SECONDS = 300
+_priority_cache: dict[str, tuple[float, set[int]]] = {}
+
+# Fall back to scanning every listener rule when no OwnerSub-tagged rule is
+# found. Opt-in: only needed while rules created before tagging still exist,
+# and otherwise every first-time user would pay for a full listener scan.
+_LEGACY_RULE_SCAN = os.environ.get("LEGACY_RULE_SCAN", "false").lower() == "true"
 
 
 def _get_client_secret() -> str:
@@ -24,12 +44,14 @@ def _get_client_secret() -> str:
     Get the OIDC client secret from Secrets Manager.
     Caches the result for subsequent calls.
     """
-    global _cached_client_secret
+    global _cached_client_secret, _secretsmanager
     if _cached_client_secret:
         return _cached_client_secret
 
+    if _secretsmanager is None:
+        _secretsmanager = boto3.client("secretsmanager", config=_BOTO_CONFIG)
     secret_arn = os.environ["OIDC_CLIENT_SECRET_ARN"]
-    resp = secretsmanager.get_secret_value(SecretId=secret_arn)
+    resp = _secretsmanager.get_secret_value(SecretId=secret_arn)
     _cached_client_secret = resp["SecretString"]
     return _cached_client_secret
 
@@ -114,26 +136,23 @@ def _get_https_listener_arn(alb_arn: str) -> str:
     raise RuntimeError(f"No HTTPS listener found on ALB {alb_arn}")
 
 
-def _get_header(event: dict, name: str) -> str | None:
+def _header_index(event: dict) -> dict[str, str]:
     """
     ALB Lambda events may provide headers in:
       - event["headers"] (single-value)
       - event["multiValueHeaders"] (list per header)
-    Header keys may vary in case. We normalize to lowercase.
+    Header keys may vary in case. Build one lowercase-keyed index per event
+    so lookups are plain dict hits.
     """
-    lname = name.lower()
-
-    headers = event.get("headers") or {}
-    for k, v in headers.items():
-        if k.lower() == lname and v:
-            return v
-
-    mvh = event.get("multiValueHeaders") or {}
-    for k, vlist in mvh.items():
-        if k.lower() == lname and vlist:
-            return vlist[0]
-
-    return None
+    index = {}
+    for k, vlist in (event.get("multiValueHeaders") or {}).items():
+        if vlist:
+            index.setdefault(k.lower(), vlist[0])
+    # Single-value headers take precedence
+    for k, v in (event.get("headers") or {}).items():
+        if v:
+            index[k.lower()] = v
+    return index
 
 
 def _alb_response(status_code: int, body: str = "", extra_headers: dict = None) -> dict:
@@ -149,27 +168,35 @@ def _alb_response(status_code: int, body: str = "", extra_headers: dict = None)
     }
 
 
+@functools.lru_cache(maxsize=256)
 def _routing_cookie_name(user_sub: str) -> str:
     """
     Generate a deterministic routing cookie name for the user.
     This cookie is used to match ALB listener rules.
     """
-    suffix = hashlib.sha1(user_sub.encode()).hexdigest()[:12]
+    suffix = hashlib.sha1(user_sub.encode(), usedforsecurity=False).hexdigest()[:12]
     return f"hp_route_{suffix}"
 
 
+@functools.lru_cache(maxsize=256)
 def _tg_name(user_sub: str, listener_arn: str) -> str:
     # TG name limit is 32 chars; keep it short and deterministic.
-    suffix = hashlib.sha1((user_sub + listener_arn).encode()).hexdigest()[:16]
+    # SHA-1 is only a uniqueness suffix here (not a security use) and must
+    # stay SHA-1 so names match target groups and cookies already deployed.
+    suffix = hashlib.sha1((user_sub + listener_arn).encode(), usedforsecurity=False).hexdigest()[:16]
     return f"u-{suffix}"  # 18 chars total
 
 
 def _get_or_create_target_group(tg_name: str, vpc_id: str) -> dict:
+    if tg_name in _cached_target_groups:
+        return _cached_target_groups[tg_name]
+
     # Try to find existing TG by name first.
     try:
         resp = elbv2.describe_target_groups(Names=[tg_name])
         tgs = resp.get("TargetGroups", [])
         if tgs:
+            _cached_target_groups[tg_name] = tgs[0]
             return tgs[0]
     except ClientError as e:
         code = e.response.get("Error", {}).get("Code", "")
@@ -207,38 +234,118 @@ def _get_or_create_target_group(tg_name: str, vpc_id: str) -> dict:
         ],
     )
 
+    _cached_target_groups[tg_name] = tg
     return tg
 
 
-def _find_existing_rule_for_user(listener_arn: str, user_sub: str) -> dict | None:
+def _register_target(target_group_arn: str, instance_id: str) -> None:
     """
-    Looks for a listener rule that matches the user's routing cookie.
-    The cookie name is deterministically generated from user_sub.
+    Register the instance with the target group unless this container already
+    did. Registration survives stop/start, so repeat calls are pure overhead.
+    """
+    if (target_group_arn, instance_id) in _registered_targets:
+        return
+    elbv2.register_targets(
+        TargetGroupArn=target_group_arn,
+        Targets=[{"Id": instance_id, "Port": 80}],
+    )
+    _registered_targets.add((target_group_arn, instance_id))
+
+
+def _find_rule_by_tag(listener_arn: str, user_sub: str) -> str | None:
+    """
+    Look up the user's listener rule via its OwnerSub tag, independent of
+    how many rules the listener has.
+    """
+    # Rule ARNs share the listener ARN's path under "listener-rule/"
+    rule_prefix = listener_arn.replace(":listener/", ":listener-rule/", 1) + "/"
+    paginator = tagging.get_paginator("get_resources")
+    for page in paginator.paginate(
+        TagFilters=[
+            {"Key": "OwnerSub", "Values": [user_sub]},
+            {"Key": "Purpose", "Values": ["HousePlannerUser"]},
+        ],
+        ResourceTypeFilters=["elasticloadbalancing:listener-rule"],
+    ):
+        for resource in page.get("ResourceTagMappingList", []):
+            if resource["ResourceARN"].startswith(rule_prefix):
+                return resource["ResourceARN"]
+    return None
+
+
+def _find_rule_by_scan(listener_arn: str, user_sub: str) -> str | None:
+    """
+    Scan every rule on the listener for the user's routing cookie.
+    Catches rules created before rules were tagged (LEGACY_RULE_SCAN only).
     """
     cookie_name = _routing_cookie_name(user_sub)
-    rules = elbv2.describe_rules(ListenerArn=listener_arn)["Rules"]
-    for r in rules:
-        for cond in r.get("Conditions", []):
-            if cond.get("Field") == "http-header":
+    paginator = elbv2.get_paginator("describe_rules")
+    for page in paginator.paginate(ListenerArn=listener_arn):
+        for r in page.get("Rules", []):
+            for cond in r.get("Conditions", []):
+                if cond.get("Field") != "http-header":
+                    continue
                 cfg = cond.get("HttpHeaderConfig") or {}
                 # Cookie header contains our routing cookie
-                if cfg.get("HttpHeaderName", "").lower() == "cookie":
-                    values = cfg.get("Values") or []
-                    # Check if any value contains our cookie name
-                    for v in values:
-                        if cookie_name in v:
-                            return r
+                if cfg.get("HttpHeaderName", "").lower() == "cookie" and any(
+                    cookie_name in v for v in cfg.get("Values") or []
+                ):
+                    return r["RuleArn"]
     return None
 
 
-def _next_available_priority(listener_arn: str, preferred: int) -> int:
+def _find_existing_rule_for_user(listener_arn: str, user_sub: str) -> str | None:
+    """
+    Returns the ARN of the listener rule that matches the user's routing
+    cookie, if one exists. The cookie name is deterministically generated
+    from user_sub.
+    """
+    rule_arn = _find_rule_by_tag(listener_arn, user_sub)
+    if rule_arn or not _LEGACY_RULE_SCAN:
+        return rule_arn
+
+    logger.info("No tagged rule for user_sub; scanning listener rules")
+    rule_arn = _find_rule_by_scan(listener_arn, user_sub)
+    if rule_arn:
+        # Backfill the tag so the next lookup for this user is a tag hit
+        try:
+            elbv2.add_tags(
+                ResourceArns=[rule_arn],
+                Tags=[
+                    {"Key": "OwnerSub", "Value": user_sub},
+                    {"Key": "Purpose", "Value": "HousePlannerUser"},
+                    {"Key": "App", "Value": "HousePlanner"},
+                ],
+            )
+        except ClientError as e:
+            logger.warning("Could not tag legacy rule %s: %s", rule_arn, e)
+    return rule_arn
+
+
+def _used_rule_priorities(listener_arn: str, *, refresh: bool = False) -> set[int]:
+    """
+    Priorities already taken on the listener, fully paginated. Cached per warm
+    container for a short TTL; a stale entry only costs one PriorityInUse retry.
+    """
+    cached = _priority_cache.get(listener_arn)
+    if cached and not refresh and time.monotonic() - cached[0] < _PRIORITY_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    used = set()
+    paginator = elbv2.get_paginator("describe_rules")
+    for page in paginator.paginate(ListenerArn=listener_arn):
+        used.update(int(r["Priority"]) for r in page.get("Rules", []) if r.get("Priority", "").isdigit())
+    _priority_cache[listener_arn] = (time.monotonic(), used)
+    return used
+
+
+def _next_available_priority(listener_arn: str, preferred: int, *, refresh: bool = False) -> int:
     """
     Ensure we never fail due to priority collisions.
     Try preferred first; if taken, scan for an open priority.
     User rules should be in range 2-9999 (after /internal/ensure at 1, before default).
     """
-    rules = elbv2.describe_rules(ListenerArn=listener_arn)["Rules"]
-    used = {int(r["Priority"]) for r in rules if r.get("Priority", "").isdigit()}
+    used = _used_rule_priorities(listener_arn, refresh=refresh)
 
     if preferred not in used:
         return preferred
@@ -251,7 +358,12 @@ def _next_available_priority(listener_arn: str, preferred: int) -> int:
     raise RuntimeError("No available listener rule priorities in range 2-9999")
 
 
-def _ensure_rule(listener_arn: str, user_sub: str, target_group_arn: str) -> None:
+def _ensure_rule(
+        listener_arn: str,
+        user_sub: str,
+        target_group_arn: str,
+        existing_rule_arn: str | None,
+) -> None:
     """
     Create a listener rule that:
     1. Matches requests with the user's routing cookie
@@ -261,17 +373,20 @@ def _ensure_rule(listener_arn: str, user_sub: str, target_group_arn: str) -> Non
     The routing cookie is set by this Lambda after provisioning.
     This approach works because cookies ARE available during rule condition evaluation,
     unlike the x-amzn-oidc-identity header which is only set after OIDC auth runs.
+
+    existing_rule_arn is the handler's _find_existing_rule_for_user result,
+    so the lookup isn't repeated here.
     """
     # If the rule already exists for this user, do nothing.
-    existing = _find_existing_rule_for_user(listener_arn, user_sub)
-    if existing:
+    if existing_rule_arn:
         logger.info("Existing rule found for user_sub; skipping create_rule.")
         return
 
     # Compute deterministic preferred priority, then find an open one if it collides.
     # Use priority range 2-9999 so user rules are checked before default action
     # but after /internal/ensure (priority 1)
-    preferred = 2 + (int(hashlib.sha1(user_sub.encode()).hexdigest()[:6], 16) % 9997)
+    digest = hashlib.sha1(user_sub.encode(), usedforsecurity=False).hexdigest()
+    preferred = 2 + (int(digest[:6], 16) % 9997)
     priority = _next_available_priority(listener_arn, preferred)
 
     # Get OIDC config from environment
@@ -282,46 +397,80 @@ def _ensure_rule(listener_arn: str, user_sub: str, target_group_arn: str) -> Non
 
     # Create rule that matches on the routing cookie
     # The Cookie header contains all cookies, so we use a wildcard pattern
-    elbv2.create_rule(
-        ListenerArn=listener_arn,
-        Priority=priority,
-        Conditions=[
-            {
-                "Field": "http-header",
-                "HttpHeaderConfig": {
-                    "HttpHeaderName": "Cookie",
-                    # Match cookie name followed by =1 anywhere in Cookie header
-                    "Values": [f"*{cookie_name}=1*"],
-                },
-            }
-        ],
-        Actions=[
-            # Action 1: Authenticate with OIDC (order=1)
-            {
-                "Type": "authenticate-oidc",
-                "Order": 1,
-                "AuthenticateOidcConfig": {
-                    "Issuer": os.environ["OIDC_ISSUER"],
-                    "AuthorizationEndpoint": os.environ["OIDC_AUTH_ENDPOINT"],
-                    "TokenEndpoint": os.environ["OIDC_TOKEN_ENDPOINT"],
-                    "UserInfoEndpoint": os.environ["OIDC_USER_INFO_ENDPOINT"],
-                    "ClientId": os.environ["OIDC_CLIENT_ID"],
-                    "ClientSecret": client_secret,
-                    "Scope": "openid email",
-                    "OnUnauthenticatedRequest": "authenticate",
-                },
-            },
-            # Action 2: Forward to user's target group (order=2)
-            {
-                "Type": "forward",
-                "Order": 2,
-                "TargetGroupArn": target_group_arn,
-            },
-        ],
-    )
+    for attempt in range(2):
+        try:
+            elbv2.create_rule(
+                ListenerArn=listener_arn,
+                Priority=priority,
+                Conditions=[
+                    {
+                        "Field": "http-header",
+                        "HttpHeaderConfig": {
+                            "HttpHeaderName": "Cookie",
+                            # Match cookie name followed by =1 anywhere in Cookie header
+                            "Values": [f"*{cookie_name}=1*"],
+                        },
+                    }
+                ],
+                Actions=[
+                    # Action 1: Authenticate with OIDC (order=1)
+                    {
+                        "Type": "authenticate-oidc",
+                        "Order": 1,
+                        "AuthenticateOidcConfig": {
+                            "Issuer": os.environ["OIDC_ISSUER"],
+                            "AuthorizationEndpoint": os.environ["OIDC_AUTH_ENDPOINT"],
+                            "TokenEndpoint": os.environ["OIDC_TOKEN_ENDPOINT"],
+                            "UserInfoEndpoint": os.environ["OIDC_USER_INFO_ENDPOINT"],
+                            "ClientId": os.environ["OIDC_CLIENT_ID"],
+                            "ClientSecret": client_secret,
+                            "Scope": "openid email",
+                            "OnUnauthenticatedRequest": "authenticate",
+                        },
+                    },
+                    # Action 2: Forward to user's target group (order=2)
+                    {
+                        "Type": "forward",
+                        "Order": 2,
+                        "TargetGroupArn": target_group_arn,
+                    },
+                ],
+                # Tag the rule so cleanup can find it without scanning the listener
+                Tags=[
+                    {"Key": "OwnerSub", "Value": user_sub},
+                    {"Key": "Purpose", "Value": "HousePlannerUser"},
+                    {"Key": "App", "Value": "HousePlanner"},
+                ],
+            )
+            break
+        except ClientError as e:
+            # Another container took the priority since our cached scan.
+            if e.response["Error"]["Code"] != "PriorityInUse" or attempt:
+                raise
+            logger.info("Priority %s already in use; rescanning listener rules", priority)
+            priority = _next_available_priority(listener_arn, preferred, refresh=True)
+    _used_rule_priorities(listener_arn).add(priority)
     logger.info("Created rule priority=%s for cookie=%s with OIDC auth", priority, cookie_name)
 
 
+_ACTIVE_INSTANCE_STATES = ["pending", "running", "stopped", "stopping"]
+# Preferred instance when a user somehow has several (running first)
+_STATE_RANK = {"running": 0, "pending": 1, "stopped": 2, "stopping": 3}
+
+
+def _describe_user_instances(user_sub: str) -> list[dict]:
+    # One filtered call: the handler needs each instance's state, which the
+    # tagging index doesn't carry, so a tagging lookup would only add a call.
+    resp = ec2.describe_instances(
+        Filters=[
+            {"Name": "tag:OwnerSub", "Values": [user_sub]},
+            {"Name": "tag:Purpose", "Values": ["HousePlannerUser"]},
+            {"Name": "instance-state-name", "Values": _ACTIVE_INSTANCE_STATES},
+        ]
+    )
+    return [i for r in resp.get("Reservations", []) for i in r.get("Instances", [])]
+
+
 def _find_instances_for_user(
         user_sub: str,
         *,
@@ -331,19 +480,7 @@ def _find_instances_for_user(
     """Find EC2 instances for a user with short retries to avoid eventual-consistency races."""
     instances: list[dict] = []
     for attempt in range(1, retries + 1):
-        resp = ec2.describe_instances(
-            Filters=[
-                {"Name": "tag:OwnerSub", "Values": [user_sub]},
-                {"Name": "tag:Purpose", "Values": ["HousePlannerUser"]},
-                {
-                    "Name": "instance-state-name",
-                    "Values": ["pending", "running", "stopped", "stopping"],
-                },
-            ]
-        )
-        instances = [
-            i for r in resp.get("Reservations", []) for i in r.get("Instances", [])
-        ]
+        instances = _describe_user_instances(user_sub)
         if instances:
             return instances
         if attempt < retries:
@@ -357,9 +494,47 @@ def _find_instances_for_user(
     return instances
 
 
+def _instance_state(instance_id: str) -> str:
+    """
+    Current state name of one instance. DescribeInstanceStatus returns just the
+    state instead of the full instance description.
+    """
+    resp = ec2.describe_instance_status(InstanceIds=[instance_id], IncludeAllInstances=True)
+    statuses = resp.get("InstanceStatuses", [])
+    # A just-launched instance may not be visible yet
+    return statuses[0]["InstanceState"]["Name"] if statuses else "pending"
+
+
+def _wait_for_running(instance_id: str, timeout_seconds: int = 60) -> None:
+    """
+    Poll until the instance is running.
+    ALB requires instances to be "running" (not just "pending") to register.
+    """
+    logger.info("Waiting for instance %s to reach running state...", instance_id)
+    for i in range(timeout_seconds):
+        current_state = _instance_state(instance_id)
+        if current_state == "running":
+            logger.info("Instance %s now running after %ds", instance_id, i + 1)
+            return
+        if i % 5 == 0:  # Log every 5 seconds to reduce noise
+            logger.info("Instance %s state=%s, waiting... (%d/%d)", instance_id, current_state, i + 1, timeout_seconds)
+        time.sleep(1)
+    logger.warning(
+        "Instance %s did not reach running state in %ds, current state=%s",
+        instance_id,
+        timeout_seconds,
+        current_state,
+    )
+
+
+def _state_rank(inst: dict) -> int:
+    return _STATE_RANK.get(inst["State"]["Name"], 99)
+
+
 def lambda_handler(event, context):
     # 1) Confirm identity (provided by ALB authenticate_oidc)
-    user_sub = _get_header(event, "x-amzn-oidc-identity")
+    headers = _header_index(event)
+    user_sub = headers.get("x-amzn-oidc-identity")
     if not user_sub:
         logger.warning("Missing x-amzn-oidc-identity header")
         return _alb_response(401, "Missing authenticated user identity")
@@ -381,12 +556,6 @@ def lambda_handler(event, context):
     # 2) Find an existing instance (prefer running/pending)
     instances = _find_instances_for_user(user_sub)
 
-    def _state_rank(inst):
-        s = inst["State"]["Name"]
-        return {"running": 0, "pending": 1, "stopped": 2, "stopping": 3}.get(s, 99)
-
-    instances.sort(key=_state_rank)
-
     # 3) Ensure TG + rule always exist (idempotent)
     tg_name = _tg_name(user_sub, listener_arn)
     tg = _get_or_create_target_group(tg_name, vpc_id)
@@ -400,7 +569,7 @@ def lambda_handler(event, context):
 
     # CASE 1 — Instance exists
     if instances:
-        inst = instances[0]
+        inst = min(instances, key=_state_rank)
         instance_id = inst["InstanceId"]
         state = inst["State"]["Name"]
         logger.info("Found instance %s state=%s for user_sub", instance_id, state)
@@ -412,25 +581,11 @@ def lambda_handler(event, context):
 
         # Wait for running state if not already running (ALB requires running state)
         if state != "running":
-            logger.info("Waiting for instance %s to reach running state...", instance_id)
-            for i in range(60):
-                resp = ec2.describe_instances(InstanceIds=[instance_id])
-                current_state = resp["Reservations"][0]["Instances"][0]["State"]["Name"]
-                if current_state == "running":
-                    logger.info("Instance %s now running after %ds", instance_id, i + 1)
-                    break
-                if i % 5 == 0:
-                    logger.info("Instance %s state=%s, waiting... (%d/60)", instance_id, current_state, i + 1)
-                time.sleep(1)
-            else:
-                logger.warning("Instance %s did not reach running in 60s, state=%s", instance_id, current_state)
-
-        elbv2.register_targets(
-            TargetGroupArn=tg["TargetGroupArn"],
-            Targets=[{"Id": instance_id, "Port": 80}],
-        )
+            _wait_for_running(instance_id)
 
-        _ensure_rule(listener_arn, user_sub, tg["TargetGroupArn"])
+        _register_target(tg["TargetGroupArn"], instance_id)
+
+        _ensure_rule(listener_arn, user_sub, tg["TargetGroupArn"], existing_rule)
 
         # Return with Set-Cookie header so browser stores the routing cookie
         return _alb_response(200, "OK", {"set-cookie": set_cookie})
@@ -461,25 +616,11 @@ def lambda_handler(event, context):
 
     # Wait for instance to be in RUNNING state before registering
     # ALB requires instances to be "running" (not just "pending") to register
-    logger.info("Waiting for instance %s to reach running state...", instance_id)
-    for i in range(60):  # Wait up to 60 seconds
-        resp = ec2.describe_instances(InstanceIds=[instance_id])
-        current_state = resp["Reservations"][0]["Instances"][0]["State"]["Name"]
-        if current_state == "running":
-            logger.info("Instance %s now running after %ds, registering with target group", instance_id, i + 1)
-            break
-        if i % 5 == 0:  # Log every 5 seconds to reduce noise
-            logger.info("Instance %s state=%s, waiting... (%d/60)", instance_id, current_state, i + 1)
-        time.sleep(1)
-    else:
-        logger.warning("Instance %s did not reach running state in 60s, current state=%s", instance_id, current_state)
+    _wait_for_running(instance_id)
 
     # Register target + ensure rule
-    elbv2.register_targets(
-        TargetGroupArn=tg["TargetGroupArn"],
-        Targets=[{"Id": instance_id, "Port": 80}],
-    )
-    _ensure_rule(listener_arn, user_sub, tg["TargetGroupArn"])
+    _register_target(tg["TargetGroupArn"], instance_id)
+    _ensure_rule(listener_arn, user_sub, tg["TargetGroupArn"], existing_rule)
 
     # Return with Set-Cookie header so browser stores the routing cookie
     return _alb_response(200, "Provisioning started", {"set-cookie": set_cookie})
@@ -0,0 +1,64 @@
+# Pre-baked House Planner workspace AMI (Amazon Linux 2023, ARM64).
+#
+# Installs the system packages, clones the app, and builds its venv once, so
+# boot/bootstrap.sh only has to configure and start services on boot.
+#
+# Build:  packer init . && packer build -var app_branch=master .
+# Use:    cdk deploy --all -c workspace_ami_name="houseplanner-arm64-*"
+
+packer {
+  required_plugins {
+    amazon = {
+      source  = "github.com/hashicorp/amazon"
+      version = ">= 1.2.0"
+    }
+  }
+}
+
+variable "region" {
+  type    = string
+  default = "us-east-1"
+}
+
+variable "app_branch" {
+  type    = string
+  default = "master"
+}
+
+source "amazon-ebs" "houseplanner" {
+  region        = var.region
+  instance_type = "t4g.small"
+  ssh_username  = "ec2-user"
+  ami_name      = "houseplanner-arm64-${formatdate("YYYYMMDDhhmmss", timestamp())}"
+
+  source_ami_filter {
+    filters = {
+      name                = "al2023-ami-2023.*-kernel-*-arm64"
+      architecture        = "arm64"
+      virtualization-type = "hvm"
+      root-device-type    = "ebs"
+    }
+    owners      = ["amazon"]
+    most_recent = true
+  }
+
+  tags = {
+    App = "HousePlanner"
+  }
+}
+
+build {
+  sources = ["source.amazon-ebs.houseplanner"]
+
+  provisioner "shell" {
+    inline = [
+      "set -euxo pipefail",
+      "sudo dnf install -y ec2-instance-connect nginx git python3.12 python3.12-devel",
+      "cd ~ && git clone https://github.com/vampireLibrarianMonk/HousingPlanner.git",
+      "cd ~/HousingPlanner && git checkout ${var.app_branch}",
+      "python3.12 -m venv ~/HousingPlanner/.venv",
+      "~/HousingPlanner/.venv/bin/python -m pip install --upgrade pip",
+      "~/HousingPlanner/.venv/bin/python -m pip install -r ~/HousingPlanner/requirements.txt",
+    ]
+  }
+}
@@ -0,0 +1,41 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# ============================================
+# Build the app's ARM64 wheel cache
+#
+# Run from the cdk directory before `cdk deploy`. The result (cdk/wheels/)
+# is uploaded as an S3 asset and installed with `pip --no-index` on boot,
+# so workspaces don't resolve or compile anything against PyPI.
+#
+# Without an ARM64 host, the build runs in the Lambda build image under
+# emulation (Docker with binfmt/qemu).
+# ============================================
+
+REQUIREMENTS="$(cd .. && pwd)/requirements.txt"
+WHEEL_DIR="$(pwd)/wheels"
+
+rm -rf "${WHEEL_DIR}"
+mkdir -p "${WHEEL_DIR}"
+
+PYTHON=python3.12
+if [[ "$(uname -m)" == "aarch64" ]] && command -v "${PYTHON}" >/dev/null; then
+  REQ_PATH="${REQUIREMENTS}"
+  OUT_PATH="${WHEEL_DIR}"
+  RUN=(bash -c)
+else
+  REQ_PATH=/requirements.txt
+  OUT_PATH=/wheels
+  RUN=(docker run --rm --platform linux/arm64
+    -v "${REQUIREMENTS}:/requirements.txt:ro"
+    -v "${WHEEL_DIR}:/wheels"
+    --entrypoint /bin/bash
+    public.ecr.aws/sam/build-python3.12:latest-arm64 -c)
+fi
+
+# pip itself is cached too, so the boot-time `pip install --upgrade pip`
+# works offline. Any sdists that still compile are built small and stripped.
+"${RUN[@]}" "${PYTHON} -m pip download pip -d ${OUT_PATH} &&
+  CFLAGS='-Os -g0 -s' ${PYTHON} -m pip wheel -r ${REQ_PATH} -w ${OUT_PATH}"
+
+echo "Built $(ls "${WHEEL_DIR}" | wc -l) wheels in ${WHEEL_DIR}"
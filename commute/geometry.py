@@ -1,4 +1,36 @@
-import polyline
+import functools
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=512)
+def _decode_polyline(encoded, precision=5):
+    """
+    Vectorized Google encoded-polyline decoder.
+
+    Decodes every varint chunk in one pass over the byte buffer instead of
+    walking the string a character at a time. Output matches
+    ``polyline.decode``; malformed input is handed to it so errors are the same.
+    Results are memoized on the encoded string (revisited legs, cached routes)
+    and returned as tuples so callers can't mutate a shared entry.
+    """
+    data = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    ends = data < 0x20
+    if not ends.size or not ends[-1] or np.count_nonzero(ends) % 2:
+        import polyline
+
+        return tuple(polyline.decode(encoded, precision))
+
+    # Each value is a run of 5-bit groups terminated by a group < 0x20.
+    starts = np.flatnonzero(np.r_[True, ends[:-1]])
+    chunk = np.cumsum(np.r_[0, ends[:-1]])
+    shift = 5 * (np.arange(data.size) - starts[chunk])
+    values = np.add.reduceat((data & 0x1F) << shift, starts)
+
+    # Zig-zag sign decoding, then running sum of (lat, lon) deltas.
+    deltas = (values >> 1) ^ -(values & 1)
+    coords = np.round(np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision, precision)
+    return tuple(zip(coords[:, 0].tolist(), coords[:, 1].tolist()))
 
 
 def decode_geometry(geometry, provider):
@@ -11,15 +43,15 @@ def decode_geometry(geometry, provider):
     if provider == "ORS":
         # ORS may return encoded polyline OR GeoJSON coordinates
         if isinstance(geometry, str):
-            return polyline.decode(geometry)
+            return list(_decode_polyline(geometry))
 
         # GeoJSON-style [[lon, lat], ...]
         return [(lat, lon) for lon, lat in geometry]
 
     if provider == "GOOGLE":
-        return polyline.decode(geometry)
+        return list(_decode_polyline(geometry))
 
     if provider == "WAZE":
-        return polyline.decode(geometry)
+        return list(_decode_polyline(geometry))
 
-    return []
\ No newline at end of file
+    return []
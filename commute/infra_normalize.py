@@ -3,6 +3,10 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Any, Dict, Iterable, List
 
+import numpy as np
+
+_DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d", "%Y-%m-%dT%H:%M:%S")
+
 
 def _parse_date(value: Any) -> str | None:
     if not value:
@@ -14,7 +18,14 @@ def _parse_date(value: Any) -> str | None:
         except Exception:
             return None
     if isinstance(value, str):
-        for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%Y-%m-%dT%H:%M:%S"):
+        # ISO-8601 is the common case; parse it without going through the
+        # strptime/exception loop below.
+        if len(value) >= 10 and value[4] == "-" and value[7] == "-":
+            try:
+                return datetime.fromisoformat(value[:19]).strftime("%Y-%m-%d")
+            except ValueError:
+                pass
+        for fmt in _DATE_FORMATS:
             try:
                 return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
             except Exception:
@@ -23,6 +34,14 @@ def _parse_date(value: Any) -> str | None:
     return None
 
 
+def _coord_column(coords: List[Dict[str, Any]], key: str) -> np.ndarray:
+    return np.fromiter(
+        (np.nan if (v := c.get(key)) is None else v for c in coords),
+        dtype=np.float64,
+        count=len(coords),
+    )
+
+
 def normalize_waze_alerts(alerts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
     normalized = []
     for alert in alerts:
@@ -64,15 +83,14 @@ def normalize_waze_jams(jams: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if not isinstance(jam, dict):
             continue
         coords = jam.get("line_coordinates") or []
-        line_coords = []
-        for coord in coords:
-            lat = coord.get("lat")
-            lon = coord.get("lon")
-            if lat is None or lon is None:
-                continue
-            line_coords.append([lon, lat])
-        if not line_coords:
+        if not coords:
+            continue
+        lats = _coord_column(coords, "lat")
+        lons = _coord_column(coords, "lon")
+        mask = ~(np.isnan(lats) | np.isnan(lons))
+        if not mask.any():
             continue
+        line_coords = np.stack([lons[mask], lats[mask]], axis=1).tolist()
         normalized.append(
             {
                 "event_id": str(jam.get("jam_id") or "waze-jam"),
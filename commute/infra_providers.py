@@ -1,13 +1,30 @@
 from __future__ import annotations
 
+import math
+import threading
 from typing import Any, Dict, Optional
 
+import orjson
 import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
 
 from config.urls import WAZE_ALERTS_JAMS_URL
 from profile.costs import record_api_usage
 
+# Keep-alive session so repeated alert lookups reuse the TLS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
 
+# Last (ETag, body) per query, so an expired cache entry can be revalidated
+# with If-None-Match instead of re-downloading an unchanged payload. Shared by
+# every session and the commute worker threads, so access goes through the lock.
+_ETAG_CACHE_SIZE = 64
+_etag_cache: dict[tuple, tuple[str, bytes]] = {}
+_etag_lock = threading.Lock()
+
+
+@st.cache_data(show_spinner=False, ttl=120)
 def fetch_waze_alerts(
     api_key: str,
     bbox: tuple[float, float, float, float],
@@ -23,8 +40,26 @@ def fetch_waze_alerts(
         "max_jams": max_jams,
     }
     headers = {"X-API-Key": api_key}
-    resp = requests.get(WAZE_ALERTS_JAMS_URL, params=params, headers=headers, timeout=timeout)
-    resp.raise_for_status()
+    etag_key = (api_key, *params.values())
+    # Snapshot the (ETag, body) pair so the 304 replays the body that ETag
+    # was stored with, whatever other threads do to the cache meanwhile.
+    with _etag_lock:
+        cached = _etag_cache.get(etag_key)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    resp = _SESSION.get(WAZE_ALERTS_JAMS_URL, params=params, headers=headers, timeout=timeout)
+    if resp.status_code == 304 and cached:
+        body = cached[1]
+    else:
+        resp.raise_for_status()
+        body = resp.content
+        etag = resp.headers.get("ETag")
+        if etag:
+            with _etag_lock:
+                _etag_cache.pop(etag_key, None)
+                _etag_cache[etag_key] = (etag, body)
+                if len(_etag_cache) > _ETAG_CACHE_SIZE:
+                    del _etag_cache[next(iter(_etag_cache))]
     record_api_usage(
         service_key="OpenWebNinja Waze Alerts & Jams",
         url=WAZE_ALERTS_JAMS_URL,
@@ -35,7 +70,7 @@ def fetch_waze_alerts(
             "query": params,
         },
     )
-    return resp.json()
+    return orjson.loads(body)
 
 
 def fetch_waze_incidents(
@@ -44,4 +79,13 @@ def fetch_waze_incidents(
 ) -> Dict[str, Any]:
     if not api_key:
         return {"alerts": [], "jams": []}
+    # Snap the box outward to a ~100 m grid so near-identical routes share
+    # the cached response instead of differing in the last float digits.
+    min_lon, min_lat, max_lon, max_lat = bbox
+    bbox = (
+        math.floor(min_lon * 1000) / 1000,
+        math.floor(min_lat * 1000) / 1000,
+        math.ceil(max_lon * 1000) / 1000,
+        math.ceil(max_lat * 1000) / 1000,
+    )
     return fetch_waze_alerts(api_key=api_key, bbox=bbox)
\ No newline at end of file
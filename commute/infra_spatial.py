@@ -2,18 +2,34 @@ from __future__ import annotations
 
 from typing import Iterable, List, Dict, Any
 
+import numpy as np
+import shapely
+from shapely import STRtree
 from shapely.geometry import LineString, Point, shape
 
 
 def build_route_buffer(points: Iterable[tuple[float, float]], meters: float) -> LineString:
-    line = LineString([(lon, lat) for lat, lon in points])
-    # crude conversion: 1 deg ~ 111km
+    lat_lon = np.asarray(points, dtype=np.float64)
+    # Snap to a ~5 m grid and drop consecutive vertices in the same cell
+    # (keeping both ends): they don't change a 100 m-scale corridor, but GEOS
+    # buffers every vertex. Snapping (not previous-point distance) keeps
+    # densely sampled curves from collapsing into straight chords.
+    cells = np.round(lat_lon / 5e-5)
+    keep = np.r_[True, (np.diff(cells, axis=0) != 0).any(axis=1)]
+    keep[-1] = True
+    lat_lon = lat_lon[keep]
+    # crude conversion: 1 deg ~ 111km (of latitude). A degree of longitude
+    # shrinks by cos(lat), so buffer with longitude scaled to match and scale
+    # back afterwards; otherwise the corridor is too narrow east-west.
     buffer_deg = meters / 111_000.0
-    return line.buffer(buffer_deg)
+    lon_scale = np.cos(np.radians(lat_lon[:, 0].mean()))
+    line = LineString(np.column_stack([lat_lon[:, 1] * lon_scale, lat_lon[:, 0]]))
+    return shapely.transform(line.buffer(buffer_deg), lambda xy: xy / [lon_scale, 1.0])
 
 
 def filter_events_by_buffer(events: Iterable[Dict[str, Any]], buffer_geom) -> List[Dict[str, Any]]:
-    filtered = []
+    kept_events = []
+    geoms = []
     for event in events:
         if not isinstance(event, dict):
             continue
@@ -26,6 +42,13 @@ def filter_events_by_buffer(events: Iterable[Dict[str, Any]], buffer_geom) -> Li
                 event_geom = Point(coords)
             else:
                 continue
-        if buffer_geom.intersects(event_geom):
-            filtered.append(event)
-    return filtered
\ No newline at end of file
+        kept_events.append(event)
+        geoms.append(event_geom)
+    if not geoms:
+        return []
+
+    # Bounding-box index over the events, then exact intersects only on the
+    # candidates; indices are sorted to keep the input order.
+    tree = STRtree(geoms)
+    hits = np.sort(tree.query(buffer_geom, predicate="intersects"))
+    return [kept_events[i] for i in hits]
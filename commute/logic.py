@@ -1,6 +1,11 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import time
 
+import numpy as np
+import requests
+
 from .providers import (
     ors_directions_driving,
     google_directions_driving,
@@ -11,6 +16,76 @@ from .infra_providers import fetch_waze_incidents
 from .infra_normalize import normalize_waze_alerts, normalize_waze_jams
 from .infra_spatial import build_route_buffer, filter_events_by_buffer
 
+# Concurrent ORS leg requests per commute
+_MAX_ROUTING_WORKERS = 8
+# Google/Waze responses are cached per departure bucket of this many minutes
+_DEPARTURE_BUCKET_MINUTES = 15
+# Waits before re-asking Waze after a failed attempt
+_WAZE_RETRY_BACKOFFS_S = (1, 2)
+_WAZE_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def _same_place(a, b) -> bool:
+    return abs(a["lat"] - b["lat"]) < 1e-6 and abs(a["lon"] - b["lon"]) < 1e-6
+
+
+def _is_retryable_waze_error(exc: Exception) -> bool:
+    if isinstance(exc, requests.HTTPError):
+        response = exc.response
+        return response is not None and response.status_code in _WAZE_RETRY_STATUSES
+    return True
+
+
+def _provider_name(routing_method: str) -> str:
+    if routing_method.startswith("OpenRouteService"):
+        return "ORS"
+    if routing_method.startswith("Google"):
+        return "Google"
+    return "Waze"
+
+
+def _haversine_matrix(locs) -> np.ndarray:
+    """Pairwise great-circle distances (meters) between locations."""
+    lat = np.radians([loc["lat"] for loc in locs])
+    lon = np.radians([loc["lon"] for loc in locs])
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * 6_371_000 * np.arcsin(np.sqrt(a))
+
+
+def tsp_2opt(dist: np.ndarray, start_idx: int = 0) -> list[int]:
+    """
+    Closed tour over every node, starting and ending at start_idx.
+
+    Seeds with nearest-neighbour, then applies 2-opt moves until no segment
+    reversal shortens the tour. Returns the visiting order (start first,
+    return leg implied). Assumes a symmetric cost matrix.
+    """
+    n = len(dist)
+    unvisited = [i for i in range(n) if i != start_idx]
+    tour = [start_idx]
+    while unvisited:
+        nxt = min(unvisited, key=lambda j: dist[tour[-1], j])
+        tour.append(nxt)
+        unvisited.remove(nxt)
+    tour = np.array(tour + [start_idx])
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            # Gain of reversing tour[i:j+1] for every j at once
+            j = np.arange(i + 1, n)
+            a, b = tour[i - 1], tour[i]
+            c, d = tour[j], tour[j + 1]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-9:
+                tour[i:j[k] + 1] = tour[i:j[k] + 1][::-1].copy()
+                improved = True
+    return tour[:-1].tolist()
+
 
 def compute_commute(
     *,
@@ -23,6 +98,7 @@ def compute_commute(
     waze_api_key,
     departure_time,
     status_callback=None,
+    optimize_order=False,
 ):
     """
     Pure commute computation.
@@ -46,26 +122,42 @@ def compute_commute(
 
     # Resolve ordered + revisit locations
     ordered_locs = []
-    revisit_locs = []
+    revisit_flags = []
     missing = []
 
-    for _, row in stops_df.iterrows():
-        label = row["Label"]
-        loc = next((l for l in locations if l["label"] == label), None)
+    label_to_loc = {}
+    for l in locations:
+        label_to_loc.setdefault(l["label"], l)
+
+    if "Revisit" in stops_df:
+        revisits = stops_df["Revisit"].fillna(False).tolist()
+    else:
+        revisits = [False] * len(stops_df)
+
+    for label, revisit in zip(stops_df["Label"].tolist(), revisits):
+        loc = label_to_loc.get(label)
         if not loc:
             missing.append(label)
             continue
 
         ordered_locs.append(loc)
-
-        if row.get("Revisit", False):
-            revisit_locs.append(loc)
+        revisit_flags.append(bool(revisit))
 
     if missing:
         raise ValueError(
             "Missing locations: " + ", ".join(missing)
         )
 
+    if optimize_order and len(ordered_locs) > 2:
+        # Ignore the table's Order and visit stops in the loop from home with
+        # the shortest haversine (straight-line) distance, not drive time. A
+        # revisited stop is one node; its second visit reuses the tour order.
+        tour = tsp_2opt(_haversine_matrix([home] + ordered_locs))
+        ordered_locs = [ordered_locs[i - 1] for i in tour[1:]]
+        revisit_flags = [revisit_flags[i - 1] for i in tour[1:]]
+
+    revisit_locs = [loc for loc, revisit in zip(ordered_locs, revisit_flags) if revisit]
+
     points = [home] + ordered_locs + revisit_locs + [home]
     return_start_index = len(ordered_locs)
 
@@ -86,18 +178,56 @@ def compute_commute(
     def _effective_api_departure(dt: datetime) -> datetime:
         return dt if dt >= min_api_departure_dt else min_api_departure_dt
 
+    def _departure_bucket(dt: datetime) -> int:
+        # Cache key only (the request keeps the exact departure): reruns for
+        # the same commute share a cached response instead of missing on a
+        # clamp that moves with the clock. Accuracy tradeoff: a cached
+        # response can be for a departure up to one bucket away.
+        return int(dt.timestamp() // (_DEPARTURE_BUCKET_MINUTES * 60))
+
     current_dt = candidate_dt
 
+    # Loiter per stop label (first row wins, as with the old per-leg lookup)
+    loiter_by_label = {}
+    if "Loiter (min)" in stops_df:
+        loiters = stops_df["Loiter (min)"].fillna(0)
+    else:
+        loiters = [0] * len(stops_df)
+    for label, loiter in zip(stops_df["Label"], loiters):
+        loiter_by_label.setdefault(label, int(loiter))
+
+    def _ors_route(a, b):
+        return ors_directions_driving(
+            api_key=ors_api_key,
+            start_lon=a["lon"], start_lat=a["lat"],
+            end_lon=b["lon"], end_lat=b["lat"],
+        )
+
+    # ORS ignores departure time, so every leg can be requested up front and
+    # the commute waits on the slowest leg rather than the sum of all of them.
+    # Google/Waze legs stay sequential: each departs at the previous arrival.
+    ors_legs = {}
+    if routing_method.startswith("OpenRouteService"):
+        n_legs = len(points) - 1
+        with ThreadPoolExecutor(max_workers=max(1, min(n_legs, _MAX_ROUTING_WORKERS))) as executor:
+            ors_legs = {
+                i: executor.submit(_ors_route, points[i], points[i + 1])
+                for i in range(n_legs)
+                if not _same_place(points[i], points[i + 1])
+            }
+
     for i in range(len(points) - 1):
         a = points[i]
         b = points[i + 1]
-
-        if routing_method.startswith("OpenRouteService"):
-            dist_m, dur_s, geom = ors_directions_driving(
-                api_key=ors_api_key,
-                start_lon=a["lon"], start_lat=a["lat"],
-                end_lon=b["lon"], end_lat=b["lat"],
-            )
+        api_departure_dt = _effective_api_departure(current_dt)
+
+        if _same_place(a, b):
+            # Zero-length leg (e.g. a stop revisited back-to-back): no API call
+            dist_m, dur_s = 0.0, 0.0
+            pts = [(a["lat"], a["lon"])]
+            provider = _provider_name(routing_method)
+        elif routing_method.startswith("OpenRouteService"):
+            dist_m, dur_s, geom = ors_legs[i].result()
             pts = decode_geometry(geom, "ORS")
             provider = "ORS"
         elif routing_method.startswith("Google"):
@@ -105,61 +235,55 @@ def compute_commute(
                 api_key=google_api_key,
                 start=a,
                 end=b,
-                departure_dt=_effective_api_departure(current_dt),
+                departure_bucket=_departure_bucket(api_departure_dt),
+                _departure_dt=api_departure_dt,
             )
             pts = decode_geometry(geom, "GOOGLE")
             provider = "Google"
         else:
-            attempt = 0
-            backoffs = [1, 2]
-            last_exc = None
-            while True:
+            # The only retry point for Waze: timeouts, connection errors,
+            # throttling/5xx and replies without a usable route. Other HTTP
+            # errors (bad key, bad request) fail immediately.
+            backoffs = _WAZE_RETRY_BACKOFFS_S
+            for attempt in range(len(backoffs) + 1):
+                if status_callback:
+                    status_callback(
+                        f"Waze routing {a['label']} → {b['label']} (attempt {attempt + 1})"
+                    )
                 try:
-                    if status_callback:
-                        status_callback(
-                            f"Waze routing {a['label']} → {b['label']} (attempt {attempt + 1})"
-                        )
                     dist_m, dur_s, geom = waze_directions_driving(
                         api_key=waze_api_key,
                         start=a,
                         end=b,
-                        departure_timestamp=int(_effective_api_departure(current_dt).astimezone(timezone.utc).timestamp()),
+                        departure_bucket=_departure_bucket(api_departure_dt),
+                        _departure_timestamp=int(api_departure_dt.astimezone(timezone.utc).timestamp()),
                         arrival_timestamp=None,
                     )
-                    last_exc = None
                     break
-                except Exception as exc:
-                    last_exc = exc
-                    if attempt >= len(backoffs):
-                        break
+                except (RuntimeError, requests.RequestException) as exc:
+                    if attempt >= len(backoffs) or not _is_retryable_waze_error(exc):
+                        raise
                     if status_callback:
                         status_callback(
-                            f"Waze timeout, retrying in {backoffs[attempt]}s..."
+                            f"Waze request failed, retrying in {backoffs[attempt]}s..."
                         )
                     time.sleep(backoffs[attempt])
-                    attempt += 1
-            if last_exc:
-                raise last_exc
 
             pts = decode_geometry(geom, "WAZE") if geom else []
             if not pts:
                 try:
-                    _, _, ors_geom = ors_directions_driving(
-                        api_key=ors_api_key,
-                        start_lon=a["lon"],
-                        start_lat=a["lat"],
-                        end_lon=b["lon"],
-                        end_lat=b["lat"],
-                    )
+                    _, _, ors_geom = _ors_route(a, b)
                     pts = decode_geometry(ors_geom, "ORS")
                 except Exception:
                     pts = []
             provider = "Waze"
 
-        if all_route_points and pts:
-            all_route_points.extend(pts[1:])
-        else:
-            all_route_points.extend(pts)
+        # Consecutive legs share their joining point; skip it without
+        # copying the leg via a pts[1:] slice.
+        leg_points = iter(pts)
+        if all_route_points:
+            next(leg_points, None)
+        all_route_points.extend(leg_points)
 
         segment_routes.append({
             "leg_index": i,
@@ -178,10 +302,7 @@ def compute_commute(
         # Apply loiter on every arrival to an included stop label.
         # This supports revisits (e.g., Daycare stop time on both directions).
         # Home is not part of stops_df, so return-to-home loiter remains zero.
-        loiter_min = 0
-        match = stops_df[stops_df["Label"] == b["label"]]
-        if not match.empty:
-            loiter_min = int(match.iloc[0].get("Loiter (min)", 0))
+        loiter_min = loiter_by_label.get(b["label"], 0)
 
         leave_dt = arrive_dt + timedelta(minutes=loiter_min)
 
@@ -224,27 +345,29 @@ def compute_infrastructure_support(
     waze_api_key,
     buffer_m=200.0,
 ):
-    if not route_points:
+    # A single point (every leg skipped as _same_place) has no line to buffer.
+    if not route_points or len(route_points) < 2:
         return {
             "events": [],
             "summary": {},
         }
 
-    lats = [pt[0] for pt in route_points]
-    lons = [pt[1] for pt in route_points]
-    bbox = (min(lons), min(lats), max(lons), max(lats))
+    route_arr = np.asarray(route_points, dtype=np.float64)
+    (min_lat, min_lon), (max_lat, max_lon) = route_arr.min(axis=0), route_arr.max(axis=0)
+    bbox = (float(min_lon), float(min_lat), float(max_lon), float(max_lat))
 
     waze_raw = fetch_waze_incidents(waze_api_key, bbox) or {}
     waze_alerts = normalize_waze_alerts(waze_raw.get("alerts", []) or [])
     waze_jams = normalize_waze_jams(waze_raw.get("jams", []) or [])
     waze_events = waze_alerts + waze_jams
 
-    buffer_geom = build_route_buffer(route_points, meters=buffer_m)
+    buffer_geom = build_route_buffer(route_arr, meters=buffer_m)
     events = filter_events_by_buffer(waze_events, buffer_geom)
 
+    type_counts = Counter(e.get("event_type") for e in events)
     summary = {
-        "incidents": sum(1 for e in events if e.get("event_type") == "incident"),
-        "jams": sum(1 for e in events if e.get("event_type") == "jam"),
+        "incidents": type_counts["incident"],
+        "jams": type_counts["jam"],
         "total": len(events),
     }
 
@@ -1,13 +1,19 @@
 from datetime import timezone
-import math
+import orjson
 import requests
 import streamlit as st
-import polyline
+from requests.adapters import HTTPAdapter
 
 from config.urls import WAZE_DRIVING_DIRECTIONS_URL
 from profile.costs import record_api_usage
 
-@st.cache_data(show_spinner=False)
+# Shared keep-alive session: one TCP/TLS handshake per host instead of one
+# per request. The pool covers the concurrent ORS leg requests.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+
+@st.cache_data(show_spinner=False, ttl=86400)
 def ors_directions_driving(
     api_key: str,
     start_lon: float,
@@ -32,9 +38,9 @@ def ors_directions_driving(
         ]
     }
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=20)
+    resp = _SESSION.post(url, headers=headers, json=payload, timeout=20)
     resp.raise_for_status()
-    data = resp.json()
+    data = orjson.loads(resp.content)
 
     # ---------------------------------------
     # Parse ORS response (features or routes)
@@ -84,17 +90,21 @@ def ors_directions_driving(
     return float(distance), float(duration), geometry
 
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, ttl=86400)
 def google_directions_driving(
     api_key: str,
     start: dict,
     end: dict,
-    departure_dt,
+    departure_bucket: int,
+    _departure_dt,
 ) -> tuple[float, float, list]:
     """
     Returns (distance_meters, duration_seconds) using Google Routes API.
-    Traffic-aware when departure_dt is provided.
+    Traffic-aware: the request departs at the exact _departure_dt. Only
+    departure_bucket is part of the cache key (the leading underscore keeps
+    _departure_dt out of it), so reruns within a bucket reuse the response.
     """
+    departure_dt = _departure_dt
     url = "https://routes.googleapis.com/directions/v2:computeRoutes"
     headers = {
         "Content-Type": "application/json",
@@ -162,7 +172,7 @@ def google_directions_driving(
 
     payload = {k: v for k, v in payload.items() if v is not None}
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=20)
+    resp = _SESSION.post(url, headers=headers, json=payload, timeout=20)
     resp.raise_for_status()
     record_api_usage(
         service_key="Google Routes API Compute Routes Essentials",
@@ -181,7 +191,7 @@ def google_directions_driving(
             },
         },
     )
-    data = resp.json()
+    data = orjson.loads(resp.content)
 
     route = data["routes"][0]
 
@@ -201,9 +211,6 @@ def google_directions_driving(
 
     polyline = (route.get("polyline") or {}).get("encodedPolyline")
 
-    if distance is None and polyline:
-        distance = _polyline_distance_meters(polyline)
-
     if distance is None or duration is None:
         raise RuntimeError(
             "Google Routes response missing distance/duration: "
@@ -217,12 +224,13 @@ def google_directions_driving(
     )
 
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, ttl=86400)
 def waze_directions_driving(
     api_key: str,
     start: dict,
     end: dict,
-    departure_timestamp: int | None = None,
+    departure_bucket: int | None = None,
+    _departure_timestamp: int | None = None,
     arrival_timestamp: int | None = None,
     distance_units: str = "auto",
     avoid_routes: str | None = None,
@@ -235,6 +243,9 @@ def waze_directions_driving(
 
     Note: Waze API prefers address strings over lat/lon coordinates.
     If address is available, use it; otherwise fall back to "lat, lon" format.
+
+    The request departs at the exact _departure_timestamp; only
+    departure_bucket is part of the cache key.
     """
     # Waze API works better with address strings than raw coordinates
     # Fall back to "lat, lon" format (note: space after comma) if no address
@@ -248,15 +259,15 @@ def waze_directions_driving(
         "country": country,
         "language": language,
     }
-    if departure_timestamp:
-        params["departure_time"] = int(departure_timestamp)
+    if _departure_timestamp:
+        params["departure_time"] = int(_departure_timestamp)
     if arrival_timestamp:
         params["arrival_time"] = int(arrival_timestamp)
     if avoid_routes:
         params["avoid_routes"] = avoid_routes
 
     headers = {"X-API-Key": api_key}
-    resp = requests.get(
+    resp = _SESSION.get(
         WAZE_DRIVING_DIRECTIONS_URL,
         params=params,
         headers=headers,
@@ -273,7 +284,7 @@ def waze_directions_driving(
             "query": params,
         },
     )
-    data = resp.json()
+    data = orjson.loads(resp.content)
 
     routes = (data.get("data") or {}).get("best_routes") or []
     if not routes:
@@ -291,30 +302,3 @@ def waze_directions_driving(
         )
 
     return float(distance), float(duration), geometry
-
-
-def _polyline_distance_meters(encoded_polyline: str) -> float | None:
-    if not encoded_polyline:
-        return None
-    try:
-        points = polyline.decode(encoded_polyline)
-    except Exception:
-        return None
-    if len(points) < 2:
-        return 0.0
-
-    total = 0.0
-    for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
-        total += _haversine_meters(lat1, lon1, lat2, lon2)
-    return total
-
-
-def _haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    r = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return r * c
\ No newline at end of file
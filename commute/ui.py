@@ -1,25 +1,74 @@
-from datetime import datetime
+import copy
+import functools
+from datetime import datetime, time as dt_time
 
 import boto3
 from botocore.exceptions import ClientError
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 import folium
-from streamlit_folium import st_folium
+import streamlit.components.v1 as components
 
 from locations.logic import _get_loc_by_label
 from profile.ui import save_current_profile
 from .logic import compute_commute, compute_infrastructure_support
 
-@st.cache_data(show_spinner=False)
-def _get_secret(secret_name: str) -> str:
-    client = boto3.client("secretsmanager")
+_DEFAULT_DEPARTURE = dt_time(7, 45)
+
+
+@st.cache_resource(show_spinner=False)
+def _secrets_client():
+    # Shared across sessions/reruns: building a client reloads botocore's
+    # service model and re-resolves credentials.
+    return boto3.client("secretsmanager")
+
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=16)
+def _get_secrets(secret_names: tuple[str, ...]) -> dict[str, str]:
+    """Load several secrets in one BatchGetSecretValue round trip."""
     try:
-        resp = client.get_secret_value(SecretId=secret_name)
+        resp = _secrets_client().batch_get_secret_value(SecretIdList=list(secret_names))
     except ClientError as e:
-        raise RuntimeError(f"Unable to load secret '{secret_name}': {e}")
-    return resp["SecretString"]
+        raise RuntimeError(f"Unable to load secrets {', '.join(secret_names)}: {e}")
+    if resp.get("Errors"):
+        err = resp["Errors"][0]
+        raise RuntimeError(
+            f"Unable to load secret '{err.get('SecretId')}': {err.get('ErrorMessage')}"
+        )
+    return {v["Name"]: v["SecretString"] for v in resp["SecretValues"]}
+
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=128)
+def _compute_commute_cached(
+    routing_method: str,
+    home: dict,
+    stops_df: pd.DataFrame,
+    locations: list[dict],
+    departure_time,
+    optimize_order: bool,
+    _api_keys: tuple,
+    _status_callback=None,
+) -> dict:
+    """
+    compute_commute keyed on the itinerary, so recomputing an unchanged trip
+    skips routing entirely. API keys and the status callback are excluded
+    from the cache key (leading underscore).
+    """
+    ors_api_key, google_api_key, waze_api_key = _api_keys
+    return compute_commute(
+        locations=locations,
+        home=home,
+        stops_df=stops_df,
+        routing_method=routing_method,
+        ors_api_key=ors_api_key,
+        google_api_key=google_api_key,
+        waze_api_key=waze_api_key,
+        departure_time=departure_time,
+        status_callback=_status_callback,
+        optimize_order=optimize_order,
+    )
 
 
 def _init_commute_profile(name: str, locations: list[dict]) -> dict:
@@ -41,8 +90,9 @@ def _init_commute_profile(name: str, locations: list[dict]) -> dict:
     return {
         "name": name,
         "routing_method": "OpenRouteService (average traffic)",
-        "departure_time": pd.to_datetime("07:45").time(),
+        "departure_time": _DEFAULT_DEPARTURE,
         "home_label": home_label,
+        "optimize_order": False,
         "commute_table": rows,
         "commute_results": {},
         "last_commute_provider": None,
@@ -50,48 +100,45 @@ def _init_commute_profile(name: str, locations: list[dict]) -> dict:
     }
 
 
+COMMUTE_TABLE_COLUMNS = ["Include", "Revisit", "Order", "Loiter (min)", "Label", "Address"]
+
+
 def _sync_commute_table(profile: dict, locations: list[dict]) -> pd.DataFrame:
-    table_records = profile.get("commute_table", [])
-    table_df = pd.DataFrame(table_records)
+    return _build_commute_table(
+        profile.get("commute_table", []), locations, profile.get("home_label")
+    )
+
 
-    home_label = profile.get("home_label")
+@st.cache_data(show_spinner=False, max_entries=32)
+def _build_commute_table(
+    commute_table: list[dict], locations: list[dict], home_label: str | None
+) -> pd.DataFrame:
+    """
+    Saved commute rows reconciled with the current locations. Cached on its
+    inputs, so repeat syncs (signature change + home change + refresh in one
+    run, or flipping back to a previous location set) don't rebuild it.
+    """
     valid_labels = {loc["label"] for loc in locations if loc["label"] != home_label}
     label_to_address = {loc["label"]: loc.get("address", "") for loc in locations}
 
-    if table_df.empty:
-        base_rows = []
-        order_counter = 1
-        for loc in locations:
-            if loc["label"] == home_label:
-                continue
-            base_rows.append({
-                "Include": False,
-                "Revisit": False,
-                "Order": order_counter,
-                "Loiter (min)": 0,
-                "Label": loc["label"],
-                "Address": loc["address"],
-            })
-            order_counter += 1
-        return pd.DataFrame(base_rows)
-
-    if "Label" in table_df.columns:
-        table_df = table_df[table_df["Label"].isin(valid_labels)].copy()
-        if "Address" in table_df.columns:
-            table_df["Address"] = table_df["Label"].map(label_to_address).fillna("")
+    # Work on plain records and build the DataFrame once at the end
+    records = [
+        {**row, "Address": label_to_address.get(row.get("Label"), "")}
+        for row in commute_table
+        if row.get("Label") in valid_labels
+    ]
 
-    existing_labels = set(table_df.get("Label", []))
-    new_rows = []
+    existing_labels = {row["Label"] for row in records}
     next_order = 1
-    if not table_df.empty and "Order" in table_df.columns:
-        numeric_orders = pd.to_numeric(table_df["Order"], errors="coerce")
+    if records:
+        numeric_orders = pd.to_numeric(pd.Series([row.get("Order") for row in records]), errors="coerce")
         if numeric_orders.notna().any():
             next_order = int(numeric_orders.max()) + 1
     for loc in locations:
         if loc["label"] == home_label:
             continue
         if loc["label"] not in existing_labels:
-            new_rows.append({
+            records.append({
                 "Include": False,
                 "Revisit": False,
                 "Order": next_order,
@@ -101,10 +148,258 @@ def _sync_commute_table(profile: dict, locations: list[dict]) -> pd.DataFrame:
             })
             next_order += 1
 
-    if new_rows:
-        table_df = pd.concat([table_df, pd.DataFrame(new_rows)], ignore_index=True)
+    return pd.DataFrame(records, columns=COMMUTE_TABLE_COLUMNS)
+
+
+# Define location marker styles for legend
+LOCATION_MARKERS = {
+    "house": {"color": "green", "icon": "home", "label": "Home"},
+    "work": {"color": "blue", "icon": "briefcase", "label": "Work"},
+    "daycare": {"color": "purple", "icon": "child", "label": "Daycare"},
+    "school": {"color": "orange", "icon": "graduation-cap", "label": "School"},
+    "gym": {"color": "red", "icon": "heart", "label": "Gym"},
+    "grocery": {"color": "cadetblue", "icon": "shopping-cart", "label": "Grocery"},
+    "default": {"color": "gray", "icon": "map-marker", "label": "Location"},
+}
+
+
+_LOCATION_KEYS = tuple(LOCATION_MARKERS)
+
+
+@functools.lru_cache(maxsize=256)
+def _marker_style_for(label_lower: str) -> dict:
+    for key in _LOCATION_KEYS:
+        if key in label_lower:
+            return LOCATION_MARKERS[key]
+    return LOCATION_MARKERS["default"]
+
+
+def get_marker_style(label: str) -> dict:
+    """Get marker style based on location label."""
+    return _marker_style_for(label.strip().lower())
+
+
+def build_legend_html(locations_sig: tuple) -> str:
+    """Build HTML for map legend from (label, address, lat, lon) tuples."""
+    return _legend_html(tuple(label for label, *_ in locations_sig))
+
+
+@st.cache_data(show_spinner=False)
+def _legend_html(labels: tuple[str, ...]) -> str:
+    # The legend only depends on which label categories are present
+    legend_items = []
+    seen_types = set()
+    for label in labels:
+        style = get_marker_style(label)
+        type_key = style["label"]
+        if type_key not in seen_types:
+            seen_types.add(type_key)
+            legend_items.append(
+                f'<div style="display:flex;align-items:center;margin:4px 0;">'
+                f'<i class="fa fa-{style["icon"]}" style="color:{style["color"]};'
+                f'font-size:14px;width:20px;"></i>'
+                f'<span style="margin-left:6px;font-size:12px;">{type_key}</span>'
+                f'</div>'
+            )
+    return (
+        '<div style="position:fixed;bottom:30px;left:10px;z-index:1000;'
+        'background:white;padding:10px;border-radius:5px;'
+        'box-shadow:0 0 5px rgba(0,0,0,0.3);max-width:150px;">'
+        '<div style="font-weight:bold;margin-bottom:6px;font-size:13px;">Legend</div>'
+        + "".join(legend_items)
+        + '</div>'
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _base_map(locations_sig: tuple) -> folium.Map:
+    """
+    Map with just the location markers and legend, which don't depend on the
+    route. Shared by every provider; callers deepcopy it before adding layers.
+    """
+    m = folium.Map(
+        location=[39.8283, -98.5795],
+        zoom_start=4,
+        tiles="OpenStreetMap",
+    )
+
+    # Add location markers
+    for label, address, lat, lon in locations_sig:
+        style = get_marker_style(label)
+
+        folium.Marker(
+            location=[lat, lon],
+            popup=f"<b>{label}</b><br>{address}",
+            icon=folium.Icon(
+                color=style["color"],
+                icon=style["icon"],
+                prefix="fa",
+            ),
+        ).add_to(m)
+
+    # Add legend
+    legend_html = build_legend_html(locations_sig)
+    m.get_root().html.add_child(folium.Element(legend_html))
+    return m
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _build_provider_map_html(
+    provider_key: str, res: dict, locations: list[dict], infra: dict
+) -> str:
+    """
+    Build and render a provider's route map to HTML. Cached on its inputs so
+    reruns that don't change the route skip folium's build + render.
+    """
+    # Build map from the shared markers + legend
+    m = copy.deepcopy(_base_map(tuple(
+        (loc["label"], loc["address"], loc["lat"], loc["lon"]) for loc in locations
+    )))
+
+    # Fit bounds (locations + route points) with padding
+    coord_arrays = [
+        np.asarray(seg["points"], dtype=np.float64)[:, :2]
+        for seg in res.get("segment_routes", [])
+        if seg.get("points")
+    ]
+    if locations:
+        coord_arrays.append(
+            np.array([[loc["lat"], loc["lon"]] for loc in locations], dtype=np.float64)
+        )
+    if coord_arrays:
+        coords = np.vstack(coord_arrays)
+        m.fit_bounds([coords.min(axis=0).tolist(), coords.max(axis=0).tolist()], padding=(20, 20))
+
+    # Add route segments
+    for seg in res.get("segment_routes", []):
+        if not seg["points"]:
+            continue
+        # ~1 m precision is plenty for display and keeps the embedded JSON
+        # small; converted once and shared by both lines of an outbound leg.
+        pts = np.asarray(seg["points"], dtype=np.float64)[:, :2].round(5).tolist()
+
+        is_return_leg = seg.get("is_return_leg", False)
+        layer_name = f"{provider_key}: {seg['label']}"
+        distance_m = seg.get("distance_m")
+        duration_s = seg.get("duration_s")
+        distance_mi = distance_m / 1609.344 if distance_m is not None else None
+        duration_min = duration_s / 60.0 if duration_s is not None else None
+        tooltip_lines = [layer_name]
+        if distance_mi is not None:
+            tooltip_lines.append(f"Distance: {distance_mi:,.2f} mi")
+        if duration_min is not None:
+            tooltip_lines.append(f"Drive: {duration_min:,.1f} min")
+        tooltip_text = "<br>".join(tooltip_lines)
+
+        leg_layer = folium.FeatureGroup(name=layer_name, show=True)
+
+        if is_return_leg:
+            folium.PolyLine(
+                locations=pts,
+                color="#000000",
+                weight=5,
+                opacity=0.9,
+                tooltip=tooltip_text,
+            ).add_to(leg_layer)
+        else:
+            folium.PolyLine(
+                locations=pts,
+                color="#000000",
+                weight=7,
+                opacity=0.5,
+            ).add_to(leg_layer)
+            folium.PolyLine(
+                locations=pts,
+                color="#FFFFFF",
+                weight=4,
+                opacity=0.95,
+                tooltip=tooltip_text,
+            ).add_to(leg_layer)
+
+        leg_layer.add_to(m)
+
+    # Add infrastructure events if available
+    infra_events = infra.get("events", [])
+    if infra_events:
+        infra_layer = folium.FeatureGroup(name="Infrastructure Events", show=True)
+        for event in infra_events:
+            geom = event.get("geometry") or {}
+            coords = geom.get("coordinates") or []
+            if not coords:
+                continue
+            event_type = event.get("event_type")
+            if event_type == "jam":
+                folium.PolyLine(
+                    locations=np.asarray(coords, dtype=np.float64)[:, ::-1].tolist(),
+                    color="#FF6F00",
+                    weight=4,
+                    opacity=0.8,
+                    tooltip=event.get("description"),
+                ).add_to(infra_layer)
+            else:
+                marker_color = "orange" if event_type == "construction" else "red"
+                folium.CircleMarker(
+                    location=[coords[1], coords[0]],
+                    radius=6,
+                    color=marker_color,
+                    fill=True,
+                    fill_color=marker_color,
+                    tooltip=event.get("description"),
+                ).add_to(infra_layer)
+        infra_layer.add_to(m)
+
+    folium.LayerControl(collapsed=False).add_to(m)
+    return m.get_root().render()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _segments_df(segments: list[dict]) -> pd.DataFrame:
+    return pd.DataFrame(segments)
+
+
+@st.fragment
+def _render_provider_map(provider_key: str, profile_key: str):
+    """
+    Render results + map for a specific provider. Runs as a fragment so
+    interactions inside a provider tab rerun only that tab, not the whole
+    commute section (secret lookups, table editor, other providers).
+    """
+    profile = st.session_state["commute_profiles"][profile_key]
+    locations = st.session_state.get("map_data", {}).get("locations", [])
+    res = profile.get("commute_results", {}).get(provider_key)
+
+    if not res:
+        st.info(f"No {provider_key} route computed yet. Select {provider_key} as Routing Method and click Compute Commute.")
+        return
+
+    # Show results summary
+    st.dataframe(_segments_df(res["segments"]), width="stretch", hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Total Distance", f"{res['total_m'] / 1609.344:,.2f} mi")
+    with col2:
+        st.metric(
+            "Total Drive Time",
+            f"{res.get('total_drive_s', res.get('total_s', 0.0)) / 60.0:,.1f} min",
+        )
+
+    col3, col4 = st.columns(2)
+    with col3:
+        st.metric(
+            "Total Loiter Time",
+            f"{res.get('total_loiter_s', 0.0) / 60.0:,.1f} min",
+        )
+    with col4:
+        st.metric(
+            "Total Trip Time",
+            f"{res.get('total_trip_s', res.get('total_s', 0.0)) / 60.0:,.1f} min",
+        )
 
-    return table_df
+    map_html = _build_provider_map_html(
+        provider_key, res, locations, profile.get("infra") or {}
+    )
+    components.html(map_html, width=900, height=500)
 
 
 def _render_commute_tab(profile_key: str, profile: dict, locations: list[dict]):
@@ -163,6 +458,8 @@ This commute analysis supports three providers:
 - API keys are loaded from AWS Secrets Manager
 - Waze may not return geometry, so ORS geometry is used as fallback for display
 - Results are cached for performance; re-run for updated data
+- Traffic-aware legs (Google/Waze) are cached per 15-minute departure window, so
+  a re-run within the same window may reuse times computed for a nearby departure
 
 **Upgrade Path**
 This section can be expanded with additional traffic-aware providers
@@ -210,7 +507,7 @@ This section can be expanded with additional traffic-aware providers
         )
         departure_time = st.time_input(
             "Departure Time (from Home)",
-            value=profile.get("departure_time") or pd.to_datetime("07:45").time(),
+            value=profile.get("departure_time") or _DEFAULT_DEPARTURE,
             help="Used for traffic-aware routing (Google only).",
             key=f"departure_time_input_{profile_key}",
         )
@@ -221,6 +518,17 @@ This section can be expanded with additional traffic-aware providers
             key=f"home_label_input_{profile_key}",
             format_func=lambda label: f"{label} — {label_to_address.get(label, 'Unknown address')}",
         )
+        optimize_order = st.checkbox(
+            "Optimize stop order (2-opt)",
+            value=bool(profile.get("optimize_order", False)),
+            help=(
+                "Ignore the Order column and visit the included stops in the "
+                "loop from Home with the shortest straight-line distance (not "
+                "drive time). A revisited stop is placed once in that loop; its "
+                "second visit follows the same order on the way back."
+            ),
+            key=f"optimize_order_input_{profile_key}",
+        )
 
         compute = st.form_submit_button("Compute Commute", type="primary")
 
@@ -229,13 +537,15 @@ This section can be expanded with additional traffic-aware providers
         profile["routing_method"] = routing_method
         profile["departure_time"] = departure_time
         profile["home_label"] = home_label
+        profile["optimize_order"] = optimize_order
         st.session_state["commute_profiles"][profile_key] = profile
         st.session_state[f"commute_home_label_{profile_key}"] = home_label
 
     # Use persisted settings for downstream logic
     routing_method = profile.get("routing_method", routing_options[0])
-    departure_time = profile.get("departure_time") or pd.to_datetime("07:45").time()
+    departure_time = profile.get("departure_time") or _DEFAULT_DEPARTURE
     home_label = profile.get("home_label") or default_home
+    optimize_order = bool(profile.get("optimize_order", False))
 
     home = _get_loc_by_label(locations, home_label)
     if not home:
@@ -296,28 +606,36 @@ This section can be expanded with additional traffic-aware providers
         key=editor_key,
     )
 
-    edited_state = st.session_state.get(editor_key, edited)
-    if isinstance(edited_state, pd.DataFrame):
-        profile["commute_table"] = edited_state.to_dict(orient="records")
-        st.session_state[table_state_key] = edited_state
+    # The editor's session value is its edit log (not a DataFrame). Only
+    # re-serialize the table into the profile when the edits or the source
+    # table actually changed, not on every rerun.
+    edits_key = f"commute_table_edits_{profile_key}"
+    source_table = st.session_state[table_state_key]
+    edits = st.session_state.get(editor_key)
+    last_source, last_edits = st.session_state.get(edits_key, (None, None))
+    if source_table is not last_source or edits != last_edits:
+        profile["commute_table"] = edited.to_dict(orient="records")
         st.session_state["commute_profiles"][profile_key] = profile
+        st.session_state[edits_key] = (source_table, copy.deepcopy(edits))
 
     # ---------------------------------------------
     # Build itinerary
     # ---------------------------------------------
-    table_for_compute = edited_state if isinstance(edited_state, pd.DataFrame) else edited
+    table_for_compute = edited
     if isinstance(table_for_compute, pd.DataFrame):
-        table_for_compute = table_for_compute.copy()
-        if "Include" in table_for_compute.columns:
-            table_for_compute["Include"] = table_for_compute["Include"].astype(bool)
-        if "Order" in table_for_compute.columns:
-            table_for_compute["Order"] = pd.to_numeric(
-                table_for_compute["Order"],
-                errors="coerce",
-            )
-        stops_df = table_for_compute[table_for_compute["Include"] == True].copy()
+        table_for_compute = table_for_compute.assign(
+            Include=table_for_compute["Include"].astype(bool),
+            Order=pd.to_numeric(table_for_compute["Order"], errors="coerce"),
+        )
+        # Small frame: select + order with NumPy instead of pandas sort machinery.
+        # compute_commute only reads stops_df, so no copy is needed.
+        stops_df = table_for_compute.iloc[table_for_compute["Include"].to_numpy(dtype=bool)]
+        stops_df = stops_df.iloc[np.lexsort((
+            stops_df["Label"].to_numpy(),
+            stops_df["Order"].to_numpy(dtype=float),
+        ))]
     else:
-        stops_df = pd.DataFrame()
+        stops_df = pd.DataFrame(columns=COMMUTE_TABLE_COLUMNS)
     if stops_df.empty:
         if "House" not in labels:
             st.warning("Home of Record is missing. Add a House location first.")
@@ -326,18 +644,17 @@ This section can be expanded with additional traffic-aware providers
     else:
         can_compute = True
 
-    stops_df.sort_values(["Order", "Label"], inplace=True)
-    duplicate_orders = stops_df["Order"].duplicated().any()
-    if stops_df["Order"].isna().any():
+    # Order is ignored when the stop order is optimized
+    orders = stops_df["Order"].to_numpy(dtype=float)
+    missing_orders = np.isnan(orders)
+    if not optimize_order and missing_orders.any():
         st.error("Each included stop must have an Order value.")
         can_compute = False
-    if duplicate_orders:
+    if not optimize_order and len(np.unique(orders[~missing_orders])) != np.count_nonzero(~missing_orders):
         st.error("Each included stop must have a unique Order value.")
         can_compute = False
 
     status_key = f"commute_status_{profile_key}"
-    progress_key = f"commute_progress_{profile_key}"
-    progress_label_key = f"commute_progress_label_{profile_key}"
 
     ors_api_key = None
     google_api_key = None
@@ -345,36 +662,29 @@ This section can be expanded with additional traffic-aware providers
 
     if status_key not in st.session_state:
         st.session_state[status_key] = ""
-    if progress_key not in st.session_state:
-        st.session_state[progress_key] = 0
-    if progress_label_key not in st.session_state:
-        st.session_state[progress_label_key] = "Idle"
 
     if not can_compute:
         st.session_state[status_key] = "Update stops and unique Order values to compute."
-        st.session_state[progress_key] = 0
-        st.session_state[progress_label_key] = "Awaiting valid input"
 
     button_col, status_col = st.columns([0.2, 0.8])
     with button_col:
         st.caption("Use the form above to compute.")
     with status_col:
-        status_placeholder = st.empty()
-        status_progress = st.empty()
-        status_placeholder.caption(st.session_state[status_key])
-        status_progress.progress(
-            st.session_state[progress_key],
-            text=st.session_state[progress_label_key],
-        )
+        st.caption(st.session_state[status_key])
 
     if compute and can_compute:
         # ---------------------------------------------
         # Routing API Keys (AWS Secrets Manager)
         # ---------------------------------------------
         try:
-            ors_api_key = _get_secret("houseplanner/ors_api_key")
-            google_api_key = _get_secret("houseplanner/google_maps_api_key")
-            waze_api_key = _get_secret("houseplanner/waze_api_key")
+            secrets = _get_secrets((
+                "houseplanner/ors_api_key",
+                "houseplanner/google_maps_api_key",
+                "houseplanner/waze_api_key",
+            ))
+            ors_api_key = secrets.get("houseplanner/ors_api_key")
+            google_api_key = secrets.get("houseplanner/google_maps_api_key")
+            waze_api_key = secrets.get("houseplanner/waze_api_key")
         except Exception as e:
             st.error(str(e))
             return
@@ -392,68 +702,29 @@ This section can be expanded with additional traffic-aware providers
                 st.error("Waze API key could not be loaded.")
                 return
 
-        st.session_state[status_key] = "Preparing commute request..."
-        st.session_state[progress_key] = 5
-        st.session_state[progress_label_key] = "Validating itinerary"
-        status_placeholder.caption(st.session_state[status_key])
-        status_progress.progress(
-            st.session_state[progress_key],
-            text=st.session_state[progress_label_key],
-        )
+        with status_col:
+            status = st.status("Computing commute...", expanded=True)
         try:
-            st.session_state[progress_key] = 15
-            st.session_state[progress_label_key] = "Requesting routing engine"
-            status_progress.progress(
-                st.session_state[progress_key],
-                text=st.session_state[progress_label_key],
-            )
-            def _update_status(message: str):
-                st.session_state[status_key] = message
-                status_placeholder.caption(message)
-
-            result = compute_commute(
-                locations=locations,
-                home=home,
-                stops_df=stops_df,
-                routing_method=routing_method,
-                ors_api_key=ors_api_key,
-                google_api_key=google_api_key,
-                waze_api_key=waze_api_key,
-                departure_time=departure_time,
-                status_callback=_update_status,
-            )
-            st.session_state[progress_key] = 55
-            st.session_state[progress_label_key] = "Normalizing route geometry"
-            status_progress.progress(
-                st.session_state[progress_key],
-                text=st.session_state[progress_label_key],
-            )
-            st.session_state[progress_key] = 70
-            st.session_state[progress_label_key] = "Fetching infrastructure events"
-            status_progress.progress(
-                st.session_state[progress_key],
-                text=st.session_state[progress_label_key],
+            status.write("Requesting routing engine")
+            result = _compute_commute_cached(
+                routing_method,
+                home,
+                stops_df,
+                locations,
+                departure_time,
+                optimize_order,
+                _api_keys=(ors_api_key, google_api_key, waze_api_key),
+                _status_callback=status.write,
             )
+            status.write("Fetching infrastructure events")
             infra = compute_infrastructure_support(
                 route_points=result.get("route_points", []),
                 waze_api_key=waze_api_key,
             )
             infra["fetched_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            st.session_state[progress_key] = 90
-            st.session_state[progress_label_key] = "Building summary + map"
-            status_progress.progress(
-                st.session_state[progress_key],
-                text=st.session_state[progress_label_key],
-            )
         except Exception as e:
             st.session_state[status_key] = "Compute failed. Check input settings."
-            st.session_state[progress_key] = 0
-            st.session_state[progress_label_key] = "Error"
-            status_placeholder.caption(st.session_state[status_key])
-            status_progress.progress(
-                st.session_state[progress_key],
-                text=st.session_state[progress_label_key],
-            )
+            status.update(label=st.session_state[status_key], state="error")
             st.error(str(e))
             return
 
@@ -485,33 +756,17 @@ This section can be expanded with additional traffic-aware providers
             f"Loiter {result.get('total_loiter_s', 0.0) / 60.0:,.1f} min"
         )
         st.session_state[status_key] = status_summary
-        st.session_state[progress_key] = 100
-        st.session_state[progress_label_key] = "Done"
-        status_placeholder.caption(st.session_state[status_key])
-        status_progress.progress(
-            st.session_state[progress_key],
-            text=st.session_state[progress_label_key],
-        )
+        status.update(label=status_summary, state="complete", expanded=False)
 
+        # The provider tabs below read the updated profile in this same run,
+        # so no st.rerun() is needed to show the new results.
         st.session_state["commute_profiles"][profile_key] = profile
-        st.rerun()
 
     # ---------------------------------------------
     # Provider Tabs with Persistent Storage
     # ---------------------------------------------
     st.subheader("Route Analysis by Provider")
 
-    # Define location marker styles for legend
-    LOCATION_MARKERS = {
-        "house": {"color": "green", "icon": "home", "label": "Home"},
-        "work": {"color": "blue", "icon": "briefcase", "label": "Work"},
-        "daycare": {"color": "purple", "icon": "child", "label": "Daycare"},
-        "school": {"color": "orange", "icon": "graduation-cap", "label": "School"},
-        "gym": {"color": "red", "icon": "heart", "label": "Gym"},
-        "grocery": {"color": "cadetblue", "icon": "shopping-cart", "label": "Grocery"},
-        "default": {"color": "gray", "icon": "map-marker", "label": "Location"},
-    }
-
     # Create tabs for each provider - put last computed provider first
     last_provider = profile.get("last_commute_provider")
     if last_provider == "Google":
@@ -524,198 +779,9 @@ This section can be expanded with additional traffic-aware providers
     provider_tabs = st.tabs(tab_order)
     tab_map = dict(zip(tab_order, provider_tabs))
 
-    def get_marker_style(label: str) -> dict:
-        """Get marker style based on location label."""
-        label_lower = label.strip().lower()
-        for key, style in LOCATION_MARKERS.items():
-            if key in label_lower:
-                return style
-        return LOCATION_MARKERS["default"]
-
-    def build_legend_html(locations: list[dict]) -> str:
-        """Build HTML for map legend."""
-        legend_items = []
-        seen_types = set()
-        for loc in locations:
-            style = get_marker_style(loc["label"])
-            type_key = style["label"]
-            if type_key not in seen_types:
-                seen_types.add(type_key)
-                legend_items.append(
-                    f'<div style="display:flex;align-items:center;margin:4px 0;">'
-                    f'<i class="fa fa-{style["icon"]}" style="color:{style["color"]};'
-                    f'font-size:14px;width:20px;"></i>'
-                    f'<span style="margin-left:6px;font-size:12px;">{type_key}</span>'
-                    f'</div>'
-                )
-        return (
-            '<div style="position:fixed;bottom:30px;left:10px;z-index:1000;'
-            'background:white;padding:10px;border-radius:5px;'
-            'box-shadow:0 0 5px rgba(0,0,0,0.3);max-width:150px;">'
-            '<div style="font-weight:bold;margin-bottom:6px;font-size:13px;">Legend</div>'
-            + "".join(legend_items)
-            + '</div>'
-        )
-
-    def render_provider_map(provider_key: str, profile: dict, locations: list[dict], home_label: str):
-        """Render map for a specific provider."""
-        res = profile.get("commute_results", {}).get(provider_key)
-
-        if not res:
-            st.info(f"No {provider_key} route computed yet. Select {provider_key} as Routing Method and click Compute Commute.")
-            return
-
-        # Show results summary
-        st.dataframe(pd.DataFrame(res["segments"]), width="stretch", hide_index=True)
-
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Total Distance", f"{res['total_m'] / 1609.344:,.2f} mi")
-        with col2:
-            st.metric(
-                "Total Drive Time",
-                f"{res.get('total_drive_s', res.get('total_s', 0.0)) / 60.0:,.1f} min",
-            )
-
-        col3, col4 = st.columns(2)
-        with col3:
-            st.metric(
-                "Total Loiter Time",
-                f"{res.get('total_loiter_s', 0.0) / 60.0:,.1f} min",
-            )
-        with col4:
-            st.metric(
-                "Total Trip Time",
-                f"{res.get('total_trip_s', res.get('total_s', 0.0)) / 60.0:,.1f} min",
-            )
-
-        # Build map
-        m = folium.Map(
-            location=[39.8283, -98.5795],
-            zoom_start=4,
-            tiles="OpenStreetMap",
-        )
-
-        bounds = []
-
-        # Add location markers and their coordinates to bounds
-        for loc in locations:
-            bounds.append([loc["lat"], loc["lon"]])
-            style = get_marker_style(loc["label"])
-
-            folium.Marker(
-                location=[loc["lat"], loc["lon"]],
-                popup=f"<b>{loc['label']}</b><br>{loc['address']}",
-                icon=folium.Icon(
-                    color=style["color"],
-                    icon=style["icon"],
-                    prefix="fa",
-                ),
-            ).add_to(m)
-
-        # Add route points to bounds for proper zoom
-        for seg in res.get("segment_routes", []):
-            pts = seg.get("points", [])
-            for pt in pts:
-                if pt and len(pt) >= 2:
-                    bounds.append([pt[0], pt[1]])
-
-        # Fit bounds with padding
-        if bounds:
-            m.fit_bounds(bounds, padding=(20, 20))
-
-        # Add route segments
-        for seg in res.get("segment_routes", []):
-            pts = seg["points"]
-            if not pts:
-                continue
-
-            is_return_leg = seg.get("is_return_leg", False)
-            layer_name = f"{provider_key}: {seg['label']}"
-            distance_m = seg.get("distance_m")
-            duration_s = seg.get("duration_s")
-            distance_mi = distance_m / 1609.344 if distance_m is not None else None
-            duration_min = duration_s / 60.0 if duration_s is not None else None
-            tooltip_lines = [layer_name]
-            if distance_mi is not None:
-                tooltip_lines.append(f"Distance: {distance_mi:,.2f} mi")
-            if duration_min is not None:
-                tooltip_lines.append(f"Drive: {duration_min:,.1f} min")
-            tooltip_text = "<br>".join(tooltip_lines)
-
-            leg_layer = folium.FeatureGroup(name=layer_name, show=True)
-
-            if is_return_leg:
-                folium.PolyLine(
-                    locations=pts,
-                    color="#000000",
-                    weight=5,
-                    opacity=0.9,
-                    tooltip=tooltip_text,
-                ).add_to(leg_layer)
-            else:
-                folium.PolyLine(
-                    locations=pts,
-                    color="#000000",
-                    weight=7,
-                    opacity=0.5,
-                ).add_to(leg_layer)
-                folium.PolyLine(
-                    locations=pts,
-                    color="#FFFFFF",
-                    weight=4,
-                    opacity=0.95,
-                    tooltip=tooltip_text,
-                ).add_to(leg_layer)
-
-            leg_layer.add_to(m)
-
-        # Add infrastructure events if available
-        infra = profile.get("infra") or {}
-        infra_events = infra.get("events", [])
-        if infra_events:
-            infra_layer = folium.FeatureGroup(name="Infrastructure Events", show=True)
-            for event in infra_events:
-                geom = event.get("geometry") or {}
-                coords = geom.get("coordinates") or []
-                if not coords:
-                    continue
-                event_type = event.get("event_type")
-                if event_type == "jam":
-                    folium.PolyLine(
-                        locations=[[lat, lon] for lon, lat in coords],
-                        color="#FF6F00",
-                        weight=4,
-                        opacity=0.8,
-                        tooltip=event.get("description"),
-                    ).add_to(infra_layer)
-                else:
-                    marker_color = "orange" if event_type == "construction" else "red"
-                    folium.CircleMarker(
-                        location=[coords[1], coords[0]],
-                        radius=6,
-                        color=marker_color,
-                        fill=True,
-                        fill_color=marker_color,
-                        tooltip=event.get("description"),
-                    ).add_to(infra_layer)
-            infra_layer.add_to(m)
-
-        # Add legend
-        legend_html = build_legend_html(locations)
-        m.get_root().html.add_child(folium.Element(legend_html))
-
-        folium.LayerControl(collapsed=False).add_to(m)
-        st_folium(m, width=900, height=500, key=f"map_{profile_key}_{provider_key}")
-
-    with tab_map["ORS"]:
-        render_provider_map("ORS", profile, locations, home_label)
-
-    with tab_map["Google"]:
-        render_provider_map("Google", profile, locations, home_label)
-
-    with tab_map["Waze"]:
-        render_provider_map("Waze", profile, locations, home_label)
+    for provider_key in tab_order:
+        with tab_map[provider_key]:
+            _render_provider_map(provider_key, profile_key)
 
     infra = profile.get("infra") or {}
     if infra:
@@ -2,10 +2,14 @@
 
 from __future__ import annotations
 
+import copy
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
-import json
+from types import MappingProxyType
+from typing import Dict, List, Mapping
+
+import orjson
 
 
 PRICING_PATH = Path(__file__).resolve().parents[1] / "pricing" / "static.json"
@@ -19,11 +23,14 @@ class PricingProfile:
     context: str
 
 
+# The registry ships with the app and doesn't change while it runs, so it is
+# read and parsed once per process. The cached dict is shared and stays private;
+# the public accessors below hand out read-only views or copies of it.
+@lru_cache(maxsize=1)
 def _load_pricing_data() -> dict:
     if not PRICING_PATH.exists():
         raise FileNotFoundError(f"Pricing registry not found: {PRICING_PATH}")
-    with PRICING_PATH.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    return orjson.loads(PRICING_PATH.read_bytes())
 
 
 def get_pricing_version() -> str:
@@ -32,7 +39,8 @@ def get_pricing_version() -> str:
     return metadata.get("version", "unknown")
 
 
-def get_llm_pricing_registry() -> Dict[str, PricingProfile]:
+@lru_cache(maxsize=1)
+def get_llm_pricing_registry() -> Mapping[str, PricingProfile]:
     data = _load_pricing_data()
     registry: Dict[str, PricingProfile] = {}
     for entry in data.get("llm_pricing", []):
@@ -45,12 +53,12 @@ def get_llm_pricing_registry() -> Dict[str, PricingProfile]:
             output_per_1m=float(entry.get("output_per_1m", 0.0)),
             context=entry.get("context", "standard"),
         )
-    return registry
+    return MappingProxyType(registry)
 
 
 def get_api_pricing_entries() -> list[dict]:
     data = _load_pricing_data()
-    return list(data.get("api_pricing", []))
+    return copy.deepcopy(data.get("api_pricing", []))
 
 
 @dataclass(frozen=True)
@@ -3,6 +3,8 @@ import re
 import requests
 import streamlit as st
 from geopy.geocoders import Nominatim
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 FEMA_FEATURE_URL = (
@@ -14,13 +16,41 @@ FEMA_DISASTER_DECLARATIONS_URL = (
     "https://www.fema.gov/api/open/v2/DisasterDeclarationsSummaries"
 )
 
+# Keep-alive session for FEMA lookups: one TLS handshake per host instead of
+# one per request. The OpenFEMA GETs are idempotent, so transient
+# throttling/5xx responses are retried with backoff.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        ),
+    ),
+)
+
+# Shared geocoder; its HTTP adapter keeps the Nominatim connection alive
+_GEOLOCATOR = Nominatim(
+    user_agent="house-planner-prototype",
+    timeout=5,
+)
+
+_STATE_ZIP_RE = re.compile(r",\s*([A-Z]{2})\s*\d{5}(-\d{4})?\s*$")
+_COUNTY_SUFFIX_RE = re.compile(r"\s+County\s*$", re.IGNORECASE)
+
 def _state_abbrev_from_address_fallback(address: str) -> str | None:
     """
     Fallback: try to extract 'VA' from '..., VA 22003' style strings.
     """
     if not address:
         return None
-    m = re.search(r",\s*([A-Z]{2})\s*\d{5}(-\d{4})?\s*$", address.strip())
+    m = _STATE_ZIP_RE.search(address.strip())
     return m.group(1) if m else None
 
 
@@ -30,7 +60,7 @@ def _to_fema_designated_area_from_county(county: str) -> str:
       'Fairfax (County)'
     """
     c = (county or "").strip()
-    c = re.sub(r"\s+County\s*$", "", c, flags=re.IGNORECASE)
+    c = _COUNTY_SUFFIX_RE.sub("", c)
     return f"{c} (County)" if c else ""
 
 
@@ -39,11 +69,7 @@ def reverse_geocode_county_state(lat: float, lon: float, address_fallback: str |
     """
     Returns (county_name, state_abbrev) using Nominatim reverse-geocode.
     """
-    geolocator = Nominatim(
-        user_agent="house-planner-prototype",
-        timeout=5,
-    )
-    loc = geolocator.reverse((lat, lon), language="en", exactly_one=True)
+    loc = _GEOLOCATOR.reverse((lat, lon), language="en", exactly_one=True)
     if not loc:
         return None, _state_abbrev_from_address_fallback(address_fallback or "")
 
@@ -87,7 +113,7 @@ def fetch_fema_disaster_declarations(
         "$top": int(top),
     }
 
-    r = requests.get(FEMA_DISASTER_DECLARATIONS_URL, params=params, timeout=30)
+    r = _SESSION.get(FEMA_DISASTER_DECLARATIONS_URL, params=params, timeout=30)
     r.raise_for_status()
     return r.json()
 
@@ -3,6 +3,8 @@
 from __future__ import annotations
 import os
 import re
+import threading
+import time
 import urllib.request
 from dataclasses import dataclass
 from typing import Any, Dict, Optional, Tuple
@@ -12,6 +14,19 @@ import streamlit as st
 
 IMDS_TOKEN_URL = "http://169.254.169.254/latest/api/token"
 IMDS_BASE_URL = "http://169.254.169.254/latest"
+IMDS_TOKEN_TTL_SECONDS = 21600
+IMDS_MAX_BACKOFF_SECONDS = 30
+
+# IMDSv2 session tokens are valid for IMDS_TOKEN_TTL_SECONDS, so one token
+# serves every metadata read instead of a PUT round trip per read.
+_imds_token_lock = threading.Lock()
+_imds_token: Optional[str] = None
+_imds_token_expires_at = 0.0
+# A single failed token fetch is retried on the next read. Repeated failures
+# (e.g. running locally, off EC2) back off exponentially, capped at
+# IMDS_MAX_BACKOFF_SECONDS, rather than blocking every caller on another timeout.
+_imds_token_failures = 0
+_imds_retry_at = 0.0
 
 
 class ProfileIdentityError(RuntimeError):
@@ -26,20 +41,40 @@ class HouseAddress:
 
 
 def _fetch_imds_token(timeout: float = 1.0) -> Optional[str]:
-    request = urllib.request.Request(
-        IMDS_TOKEN_URL,
-        method="PUT",
-        headers={"X-aws-ec2-metadata-token-ttl-seconds": "21600"},
-    )
-    try:
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            return response.read().decode("utf-8")
-    except Exception:
-        return None
+    global _imds_token, _imds_token_expires_at, _imds_token_failures, _imds_retry_at
+    with _imds_token_lock:
+        now = time.monotonic()
+        if _imds_token and now < _imds_token_expires_at:
+            return _imds_token
+        if now < _imds_retry_at:
+            return None
+
+        request = urllib.request.Request(
+            IMDS_TOKEN_URL,
+            method="PUT",
+            headers={"X-aws-ec2-metadata-token-ttl-seconds": str(IMDS_TOKEN_TTL_SECONDS)},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                token = response.read().decode("utf-8")
+        except Exception:
+            _imds_token_failures += 1
+            if _imds_token_failures > 1:
+                backoff = min(IMDS_MAX_BACKOFF_SECONDS, 2 ** (_imds_token_failures - 1))
+                _imds_retry_at = time.monotonic() + backoff
+            return None
+
+        _imds_token_failures = 0
+        # Refresh a minute early so a token never expires mid-request
+        _imds_token = token
+        _imds_token_expires_at = time.monotonic() + IMDS_TOKEN_TTL_SECONDS - 60
+        return token
 
 
 def _imds_get(path: str, timeout: float = 1.0) -> Optional[str]:
     token = _fetch_imds_token(timeout=timeout)
+    # Without a token (PUT failed or backing off) fall back to an IMDSv1 read,
+    # which still works on hosts that don't enforce IMDSv2.
     headers = {"X-aws-ec2-metadata-token": token} if token else {}
     request = urllib.request.Request(
         f"{IMDS_BASE_URL}/{path.lstrip('/')}",